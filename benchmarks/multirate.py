@@ -0,0 +1,67 @@
+"""
+Compares local time stepping (`lts_levels` larger than one) with the global time step
+on tanks with strong depth contrast: error of the last instant, against a reference
+with a quarter of the global `dt`, and time.
+
+Usage: python benchmarks/multirate.py [n_cells] [n_steps]
+"""
+import sys
+import time
+import numpy as np
+import rippleTank as rt
+
+def trench(lts_levels, n_cells):
+    tank = rt.RippleTank((-50, 50), (-50, 50), units = 'm', n_cells_x = n_cells, n_cells_y = n_cells,
+                        lts_levels = lts_levels)
+    rt.Source(tank, rt.sineSource, xcorners = (-2, 2), ycorners = (10, 12), freq = 0.05)
+    deep = np.full(tank.X.shape, 1/64.0)
+    deep[np.abs(tank.Y + 20) < 4] = 1.0
+    rt.Mask(tank).fromArray(deep)
+    return tank
+
+def harbour(lts_levels, n_cells):
+    tank = rt.RippleTank((-50, 50), (-50, 50), units = 'm', n_cells_x = n_cells, n_cells_y = n_cells,
+                        lts_levels = lts_levels)
+    rt.Source(tank, rt.sineSource, xcorners = (-50, 50), ycorners = (40, 42), freq = 0.05)
+    deep = np.full(tank.X.shape, 1/16.0)
+    deep[tank.Y < -30] = 1.0
+    rt.Mask(tank).fromArray(deep)
+    rt.Mask(tank).fromFunc(rt.rectangleMask, ((-50, -10), (0, 3)))
+    return tank
+
+EXAMPLES = [trench, harbour]
+
+def simulate(example, lts_levels, n_cells, duration, dt = None):
+    """
+    Simulates `duration` seconds of `example` with `lts_levels`, and `dt` if given.
+
+    Returns:
+        np.ndarray: amplitude of the last instant.
+        float: seconds spent.
+    """
+    tank = example(lts_levels, n_cells)
+    if dt is not None:
+        tank.setdt(dt)
+    n_instants = int(round(duration/tank.dt)) + 1
+    start = time.perf_counter()
+    for i, level in tank.iterLevels(n_instants):
+        pass
+    return level.copy(), time.perf_counter() - start
+
+def main(n_cells = 300, n_steps = 1600):
+    print("%-10s %6s %12s %12s %8s"%("example", "levels", "max error", "rms error", "speedup"))
+    for example in EXAMPLES:
+        dt = example(1, n_cells).dt
+        duration = n_steps*dt
+        reference = simulate(example, 1, n_cells, duration, dt/4)[0]
+        scale = np.abs(reference).max()
+        for lts_levels in (1, 2, 3, 4):
+            amplitude, spent = simulate(example, lts_levels, n_cells, duration)
+            if lts_levels == 1:
+                global_time = spent
+            error = amplitude - reference
+            print("%-10s %6d %12.2e %12.2e %7.2fx"%(example.__name__, lts_levels,
+                    np.abs(error).max()/scale, np.sqrt(np.mean(error**2))/scale, global_time/spent))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
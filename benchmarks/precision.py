@@ -0,0 +1,77 @@
+"""
+Compares single precision (`dtype=np.float32`) simulations of the bundled examples with
+double precision ones: error of the amplitude, memory of the stored frames and time.
+
+Usage: python benchmarks/precision.py [n_cells]
+"""
+import sys
+import time
+import numpy as np
+import rippleTank as rt
+
+def simpleSource(dtype, n_cells):
+    tank = rt.RippleTank(n_cells_x = n_cells, n_cells_y = n_cells, dtype = dtype)
+    rt.Source(tank, rt.sineSource, freq = 10)
+    return tank, 2.0, 0.5
+
+def singleSlit(dtype, n_cells):
+    tank = rt.RippleTank(n_cells_x = n_cells, n_cells_y = n_cells, dtype = dtype)
+    rt.Source(tank, rt.sineSource, xcorners = (-15, 15), ycorners = (10, 11), freq = 10.0)
+    rt.Mask(tank).fromFunc(rt.singleSlit, ((-15, 15), (0, tank.dy)))
+    return tank, 2.0, 0.5
+
+def halfCircle(dtype, n_cells):
+    tank = rt.RippleTank(bc = 'close', n_cells_x = n_cells, n_cells_y = n_cells, dtype = dtype)
+    rt.Source(tank, rt.sineSource, xcorners = (-tank.dx, tank.dx),
+                                    ycorners = (10-tank.dy, 10+tank.dy), freq = 10.0)
+    width = (tank.dx**2 + tank.dy**2)**0.5
+    rt.Mask(tank).fromFunc(rt.halfCircleMask, (0, -4, 6, width, 'x', 'lower'))
+    return tank, 2.0, 0.5
+
+def multipleSources(dtype, n_cells):
+    tank = rt.RippleTank(n_cells_x = n_cells, n_cells_y = n_cells, dtype = dtype)
+    rt.Source(tank, rt.sineSource, xcorners = (-5-tank.dx, -5+tank.dx),
+                                    ycorners = (-tank.dy, tank.dy), freq = 10.0)
+    rt.Source(tank, rt.sineSource, xcorners = (5-tank.dx, 5+tank.dx),
+                                    ycorners = (-tank.dy, tank.dy), freq = 5.0)
+    return tank, 2.0, 0.5
+
+def breakwater(dtype, n_cells):
+    tank = rt.RippleTank((-50, 50), (-50, 50), units = 'm', n_cells_x = n_cells, n_cells_y = n_cells, dtype = dtype)
+    rt.Source(tank, rt.sineSource, xcorners = (-50, 50), ycorners = (25, 30), freq = 2/15.0)
+    rt.Mask(tank).fromFunc(rt.rectangleMask, ((0, 3), (-50, -20)))
+    rt.Mask(tank).fromFunc(rt.rectangleMask, ((25, 28), (-50, -20)))
+    x = np.linspace(0, 1, tank.X.shape[1])
+    y = np.linspace(0, 1, tank.X.shape[0])
+    X, Y = np.meshgrid(x, y)
+    rt.Mask(tank).fromArray(Y)
+    return tank, 60.0, 10.0
+
+EXAMPLES = [simpleSource, singleSlit, halfCircle, multipleSources, breakwater]
+
+def simulate(example, dtype, n_cells):
+    """
+    Simulates `example` with `dtype` grids.
+
+    Returns:
+        np.ndarray: 3d amplitude array.
+        float: seconds spent.
+    """
+    tank, sim_duration, animation_speed = example(dtype, n_cells)
+    start = time.perf_counter()
+    tank.simulateTime(sim_duration, animation_speed = animation_speed)
+    return tank.amplitude, time.perf_counter() - start
+
+def main(n_cells = 100):
+    print("%-16s %12s %12s %10s %10s %8s"%("example", "max error", "rms error", "MB f64", "MB f32", "speedup"))
+    for example in EXAMPLES:
+        double, double_time = simulate(example, np.float64, n_cells)
+        single, single_time = simulate(example, np.float32, n_cells)
+        scale = np.abs(double).max()
+        error = single - double
+        print("%-16s %12.2e %12.2e %10.1f %10.1f %7.2fx"%(example.__name__,
+                np.abs(error).max()/scale, np.sqrt(np.mean(error**2))/scale,
+                double.nbytes/2.0**20, single.nbytes/2.0**20, double_time/single_time))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
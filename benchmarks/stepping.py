@@ -0,0 +1,60 @@
+"""
+Compares the steps per second of the in place stepping kernel of `RippleTank.solveInstant`
+with the previous implementation, which allocated new arrays on every instant.
+
+Usage: python benchmarks/stepping.py [n_steps]
+"""
+import sys
+import time
+import numpy as np
+import rippleTank as rt
+
+def referenceInstant(tank, previous, current, following):
+    """
+    Previous implementation of `RippleTank.solveInstant`.
+    """
+    speed = np.sqrt(tank.g*(following + tank.masked_deep))
+    ratiox = (speed*tank.dt/tank.dx)**2
+    ratioy = (speed*tank.dt/tank.dy)**2
+    temp = np.zeros_like(tank.X)
+    temp[1:-1, 1:-1] = ratiox[1:-1, 1:-1]*(current[1:-1, :-2] - 2*current[1:-1, 1:-1] + current[1:-1, 2:])\
+                + ratioy[1:-1, 1:-1]*(current[:-2, 1:-1] - 2*current[1:-1, 1:-1] + current[2:, 1:-1])
+    following[1:-1, 1:-1] = 2*current[1:-1, 1:-1] - previous[1:-1, 1:-1] + temp[1:-1, 1:-1]
+
+    courantx = speed*tank.dt/tank.dx
+    couranty = speed*tank.dt/tank.dy
+    following[0] = couranty[0]*(current[1] - current[0]) + current[0]
+    following[-1] = -couranty[-1]*(current[-1] - current[-2]) + current[-1]
+    following[:, 0] = courantx[:, 0]*(current[:, 1] - current[:, 0]) + current[:, 0]
+    following[:, -1] = -courantx[:, -1]*(current[:, -1] - current[:, -2]) + current[:, -1]
+    following[speed == 0] = 0
+
+def stepsPerSecond(tank, step, n_steps):
+    """
+    Runs `n_steps` instants with the `step` function.
+
+    Returns:
+        float: steps per second.
+        np.ndarray: last amplitude array.
+    """
+    tank.prepareStepping()
+    previous, current, following = [np.zeros_like(tank.X) for i in range(3)]
+    current[tank.n_cells_y//2, tank.n_cells_x//2] = 0.1
+
+    start = time.perf_counter()
+    for i in range(n_steps):
+        following.fill(0)
+        step(previous, current, following)
+        previous, current, following = current, following, previous
+    return n_steps/(time.perf_counter() - start), current
+
+def main(n_steps = 50):
+    for n_cells in (500, 2000):
+        tank = rt.RippleTank(n_cells_x = n_cells, n_cells_y = n_cells)
+        reference, first = stepsPerSecond(tank, lambda *levels: referenceInstant(tank, *levels), n_steps)
+        kernel, second = stepsPerSecond(tank, tank.solveInstant, n_steps)
+        print("%dx%d: reference %.1f steps/s, in place %.1f steps/s, speedup %.2fx, same result: %s"%(
+                n_cells, n_cells, reference, kernel, kernel/reference, np.array_equal(first, second)))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
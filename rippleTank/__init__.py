@@ -1,3 +1,11 @@
 from .tank import *
 from .masks import *
 from .sources import *
+from .probes import *
+from .storage import *
+from .backends import *
+from .distributed import *
+from .steady import *
+from .multirate import *
+from .batch import *
+from .sweeps import *
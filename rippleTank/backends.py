@@ -0,0 +1,627 @@
+import warnings
+import itertools
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+__all__ = ['Backend', 'NumpyBackend', 'NumbaBackend', 'registerBackend', 'getBackend', 'STENCILS', 'CFL_LIMITS']
+
+BACKENDS = {} #: available backends by name
+BLOCK_CELLS = 2**16 #: maximum number of cells of a band, so that its buffers stay on cache
+STENCILS = {2: (-2.0, 1.0),
+            4: (-5/2.0, 4/3.0, -1/12.0),
+            6: (-49/18.0, 3/2.0, -3/20.0, 1/90.0)} #: second derivative coefficients by order, from the center outwards
+CFL_LIMITS = {order: 2/np.sqrt(2*(abs(coefs[0]) + 2*sum(abs(c) for c in coefs[1:])))
+              for order, coefs in STENCILS.items()} #: largest stable `alpha` by order when dx equals dy
+
+def registerBackend(name, backend):
+    """
+    Makes the `backend` class available to `RippleTank` objects under `name`.
+    """
+    BACKENDS[name] = backend
+
+def getBackend(backend):
+    """
+    Creates the backend called `backend`. If its dependencies are not installed
+    the NumPy backend is used instead.
+
+    Raises:
+        Exception: "backend is not a valid backend."
+
+    Returns:
+        Backend: backend object.
+    """
+    if isinstance(backend, Backend):
+        return backend
+    if not backend in BACKENDS:
+        raise(Exception("'%s' is not a valid backend."%backend))
+    backend = BACKENDS[backend]
+    if not backend.isAvailable():
+        warnings.warn("'%s' backend is not available, using 'numpy' instead."%backend.name)
+        backend = BACKENDS['numpy']
+    return backend()
+
+def splitRows(first, last, n_bands):
+    """
+    Splits the rows from `first` to `last` in `n_bands` contiguous bands of similar size.
+
+    Returns:
+        list: (first, last) rows of every band, last row excluded.
+    """
+    n_bands = max(1, min(n_bands, last - first))
+    limits = np.linspace(first, last, n_bands + 1).round().astype(int)
+    return [(limits[i], limits[i+1]) for i in range(n_bands)]
+
+class Backend():
+    """
+    Backends perform the stepping of a `RippleTank`: the propagation speed update,
+    the interior update and the boundaries update. They work in place on the
+    buffers allocated by `prepare`. On linear tanks the propagation speed only depends
+    on the deep, it is calculated once by `calcSpeed` and is not updated while stepping.
+    Otherwise the speed follows the wave height, and the equation is
+    `div(g*(deep + height)*grad(height))`: the differences of the deep, of the `order`
+    of the tank, plus the ones of the wave height in second order flux form, which
+    conserves the energy and keeps the crests stable while `dt` resolves their speed.
+
+    The grid is split in bands of rows, at least `n_threads` and small enough to keep their
+    buffers on cache (`BLOCK_CELLS`). Every band only writes its own rows, thus bands are
+    solved in parallel by a persistent pool of threads, synchronized once per instant.
+    Results do not depend on the number of bands. Bands are clipped to the box of cells
+    `active` of the tank, when it is not None (see `RippleTank.growActive`).
+
+    Central differences have the `order` of `rippletank`, see `STENCILS`. Cells closer to
+    the boundaries than half the stencil width use the highest order that fits.
+
+    When `bc` is 'pml' the waves are absorbed by a perfectly matched layer, following
+    Grote and Sim: inside the layer the update includes damping terms and the divergence
+    of two auxiliary fields, `pml_fields`, which are updated on a previous pass over the
+    bands so that no band reads rows being written by another one.
+    """
+    name = None #: name used to register the backend
+
+    def __init__(self):
+        self.pool = None #: thread pool used to solve the bands
+        self.n_threads = 1 #: number of threads of `pool`
+
+    @classmethod
+    def isAvailable(cls):
+        """
+        Checks if the dependencies of the backend are installed.
+
+        Returns:
+            bool: True if the backend can be used.
+        """
+        return True
+
+    def prepare(self, rippletank, rows = None):
+        """
+        Allocates the arrays used while stepping on `rippletank`: propagation speed,
+        finite differences quotients, dry points and the work buffers of every band.
+        Only the `rows` (first, last) are solved, by default all of them. Grids are the
+        last two axes of `rippletank.X`, leading axes are stepped at once (see `TankBatch`).
+        """
+        shape, dtype = rippletank.X.shape, rippletank.dtype
+        batch, n_rows, n_columns = shape[:-2], shape[-2], shape[-1]
+        rippletank.speed = np.zeros(shape, dtype = dtype)
+        rippletank.courantx = np.zeros(shape, dtype = dtype)
+        rippletank.couranty = np.zeros(shape, dtype = dtype)
+        rippletank.ratiox = np.zeros(shape, dtype = dtype)
+        rippletank.ratioy = np.zeros(shape, dtype = dtype)
+        rippletank.dry = np.zeros(shape, dtype = bool)
+        rippletank.laplacian = np.zeros(shape, dtype = dtype)
+        rippletank.pml_fields = rippletank.pml_coefs = None
+        if rippletank.bc == 'pml':
+            self.preparePml(rippletank)
+
+        rippletank.work = []
+        if rows is None:
+            rows = (0, n_rows)
+        n_cells = int(np.prod(batch))*(rows[1] - rows[0])*n_columns
+        n_bands = max(rippletank.n_threads, int(np.ceil(n_cells/float(BLOCK_CELLS))))
+        bands = splitRows(rows[0], rows[1], n_bands)
+        for first, last in bands:
+            inner = batch + (max(min(last, n_rows - 1) - max(first, 1), 0), n_columns - 2)
+            # auxiliary fields are also solved on the halo rows, if any
+            fields = (first - (first == rows[0] and first > 0), last + (last == rows[1] and last < n_rows))
+            rippletank.work += [{'rows': (first, last),
+                                'columns': (0, n_columns),
+                                'inner': [np.zeros(inner, dtype = dtype) for i in range(2 if rippletank.order == 2 and rippletank.linear else 3)],
+                                'row': np.zeros(batch + (n_columns, ), dtype = dtype),
+                                'column': np.zeros(batch + (last - first, ), dtype = dtype),
+                                'pml': self.layerRegions(rippletank, first, last),
+                                'pml_fields': self.layerRegions(rippletank, *fields)}]
+
+        if rippletank.n_threads != self.n_threads:
+            if self.pool is not None:
+                self.pool.shutdown()
+            self.pool = None
+            self.n_threads = rippletank.n_threads
+        if self.pool is None and self.n_threads > 1:
+            self.pool = ThreadPoolExecutor(max_workers = self.n_threads)
+
+    def preparePml(self, rippletank):
+        """
+        Calculates the coefficients of the perfectly matched layer for the current `dt`,
+        and allocates its auxiliary fields. Fields are scaled by dt**2/(2*dx) on x and
+        dt**2/(2*dy) on y, so that their central differences are added to the update directly.
+        """
+        tank = rippletank
+        sigmax, sigmay = tank.pml
+        halfx, halfy = sigmax*tank.dt/2, sigmay*tank.dt/2
+        speed2 = tank.g*tank.masked_deep
+        tank.pml_coefs = {'damping': halfx + halfy,
+                          'scale': 1/(1 + halfx + halfy),
+                          'mass': tank.dt*tank.dt*sigmax*sigmay,
+                          'decayx': (1 - halfx)/(1 + halfx),
+                          'decayy': (1 - halfy)/(1 + halfy),
+                          'gainx': tank.dt**3*speed2*(sigmay - sigmax)/((1 + halfx)*4*tank.dx*tank.dx),
+                          'gainy': tank.dt**3*speed2*(sigmax - sigmay)/((1 + halfy)*4*tank.dy*tank.dy)}
+        tank.pml_fields = [np.zeros(tank.X.shape, dtype = tank.dtype) for i in range(2)]
+
+    def layerRegions(self, rippletank, first, last):
+        """
+        Splits the interior cells of the perfectly matched layer on the rows `first` to
+        `last`, plus the cells next to it, in rectangles with a buffer each. Rows inside the
+        layer are taken whole, other rows only `pml_width` + 1 columns on each side.
+
+        Returns:
+            list: rows slice, columns slice and buffer of every rectangle.
+        """
+        if rippletank.bc != 'pml':
+            return []
+        shape = rippletank.X.shape
+        batch, n_rows, n_columns = shape[:-2], shape[-2], shape[-1]
+        width = rippletank.pml_width + 1
+        layer = np.reshape(rippletank.pml[1][..., n_columns//2] != 0, (-1, n_rows)).any(axis = 0)
+        whole = layer.copy()
+        whole[1:] |= layer[:-1]
+        whole[:-1] |= layer[1:]
+
+        regions = []
+        rows = range(max(first, 1), min(last, n_rows - 1))
+        for is_whole, group in itertools.groupby(rows, lambda j: whole[j]):
+            group = list(group)
+            top, bottom = group[0], group[-1] + 1
+            columns = [(1, n_columns - 1)] if is_whole else [(1, width), (n_columns - width, n_columns - 1)]
+            for left, right in columns:
+                if left < right:
+                    regions += [(slice(top, bottom), slice(left, right),
+                                np.zeros(batch + (bottom - top, right - left), dtype = rippletank.dtype))]
+        return regions
+
+    def calcSpeed(self, rippletank, values):
+        """
+        Calculates the propagation speed, the finite differences quotients and the dry
+        points for the wave heights `values`.
+        """
+        for band in rippletank.work:
+            self.calcSpeedBand(rippletank, values, band)
+
+    def secondPart(self, rippletank, current, out):
+        """
+        Writes on the interior of `out` the central differences of `current`, only on
+        the cells of `rippletank.active` if it is not None.
+        """
+        for band in self.activeBands(rippletank):
+            self.secondPartBand(rippletank, current, out, band)
+
+    def solveBorders(self, rippletank, current, following):
+        """
+        Writes on the boundaries of `following` the open boundary update of `current`,
+        or zeros if the boundaries are closed or behind a perfectly matched layer.
+        """
+        for band in rippletank.work:
+            self.solveBordersBand(rippletank, current, following, band)
+
+    def solveInstant(self, rippletank, previous, current, following):
+        """
+        Writes on `following` the state after `current`, which comes after `previous`.
+        Only the cells of `rippletank.active` are written, if it is not None.
+        """
+        bands = self.activeBands(rippletank)
+        if rippletank.bc == 'pml':
+            self.mapBands(rippletank, lambda band: self.pmlFieldsBand(rippletank, current, band), bands)
+        self.mapBands(rippletank, lambda band: self.solveInstantBand(rippletank, previous, current, following, band), bands)
+
+    def activeBands(self, rippletank):
+        """
+        Clips the bands to the box of cells `rippletank.active`, (top, bottom, left, right)
+        with bottom and right excluded. Buffers and regions of the perfectly matched
+        layer of the clipped bands are views of the ones of the bands.
+
+        Returns:
+            list: bands with cells on the box.
+        """
+        if rippletank.active is None:
+            return rippletank.work
+        top, bottom, left, right = rippletank.active
+        n_rows = rippletank.X.shape[-2]
+        bands = []
+        for band in rippletank.work:
+            first, last = max(band['rows'][0], top), min(band['rows'][1], bottom)
+            if first >= last or left >= right:
+                continue
+            offset = max(first, 1) - max(band['rows'][0], 1)
+            n_inner = max(min(last, n_rows - 1) - max(first, 1), 0)
+            inner_columns = slice(max(left, 1) - 1, max(min(right, rippletank.X.shape[-1] - 1) - 1, max(left, 1) - 1))
+            clipped = {'rows': (first, last),
+                       'columns': (left, right),
+                       'inner': [buffer[..., offset:offset + n_inner, inner_columns] for buffer in band['inner']],
+                       'row': band['row'][..., left:right],
+                       'column': band['column'][..., first - band['rows'][0]:last - band['rows'][0]],
+                       'pml': [], 'pml_fields': []}
+            for name in ('pml', 'pml_fields'):
+                for rows, columns, buffer in band[name]:
+                    start, stop = max(rows.start, top), min(rows.stop, bottom)
+                    begin, end = max(columns.start, left), min(columns.stop, right)
+                    if start < stop and begin < end:
+                        clipped[name] += [(slice(start, stop), slice(begin, end),
+                            buffer[..., start - rows.start:stop - rows.start, begin - columns.start:end - columns.start])]
+            bands += [clipped]
+        return bands
+
+    def mapBands(self, rippletank, solve, bands = None):
+        """
+        Calls `solve` with every band, by default the ones of `rippletank.work`, on the
+        thread pool if there is one.
+        """
+        if bands is None:
+            bands = rippletank.work
+        if self.pool is None:
+            for band in bands:
+                solve(band)
+        else:
+            for result in self.pool.map(solve, bands):
+                pass
+
+    def pmlFieldsBand(self, rippletank, current, band):
+        """
+        Advances the auxiliary fields of the perfectly matched layer on the rows of `band`.
+        """
+        coefs = rippletank.pml_coefs
+        fieldx, fieldy = rippletank.pml_fields
+        for rows, columns, buffer in band['pml_fields']:
+            region = (Ellipsis, rows, columns)
+            right = (Ellipsis, rows, slice(columns.start + 1, columns.stop + 1))
+            left = (Ellipsis, rows, slice(columns.start - 1, columns.stop - 1))
+            down = (Ellipsis, slice(rows.start + 1, rows.stop + 1), columns)
+            up = (Ellipsis, slice(rows.start - 1, rows.stop - 1), columns)
+            for field, decay, gain, ahead, behind in ((fieldx, 'decayx', 'gainx', right, left),
+                                                      (fieldy, 'decayy', 'gainy', down, up)):
+                np.subtract(current[ahead], current[behind], out = buffer)
+                np.multiply(buffer, coefs[gain][region], out = buffer)
+                np.multiply(field[region], coefs[decay][region], out = field[region])
+                np.add(field[region], buffer, out = field[region])
+
+    def pmlBand(self, rippletank, previous, current, following, band):
+        """
+        Turns the undamped update written on `following` into the perfectly matched layer
+        update, on the layer cells of the rows of `band`.
+        """
+        tank = rippletank
+        if len(band['pml']) == 0:
+            return
+        coefs = tank.pml_coefs
+        fieldx, fieldy = tank.pml_fields
+        for rows, columns, buffer in band['pml']:
+            region = (Ellipsis, rows, columns)
+            target = following[region]
+            np.multiply(previous[region], coefs['damping'][region], out = buffer)
+            np.add(target, buffer, out = target)
+            np.multiply(current[region], coefs['mass'][region], out = buffer)
+            np.subtract(target, buffer, out = target)
+            np.subtract(fieldx[..., rows, columns.start + 1:columns.stop + 1],
+                        fieldx[..., rows, columns.start - 1:columns.stop - 1], out = buffer)
+            np.add(target, buffer, out = target)
+            np.subtract(fieldy[..., rows.start + 1:rows.stop + 1, columns],
+                        fieldy[..., rows.start - 1:rows.stop - 1, columns], out = buffer)
+            np.add(target, buffer, out = target)
+            np.multiply(target, coefs['scale'][region], out = target)
+            np.copyto(target, 0, where = tank.dry[region])
+
+    def calcSpeedBand(self, rippletank, values, band, ratios = True):
+        """
+        `calcSpeed` on the rows of `band`. Finite differences quotients are only updated
+        if `ratios`, nonlinear stepping keeps the ones of the deep.
+        """
+        raise(NotImplementedError)
+
+    def secondPartBand(self, rippletank, current, out, band):
+        """
+        `secondPart` on the rows of `band`.
+        """
+        raise(NotImplementedError)
+
+    def solveBordersBand(self, rippletank, current, following, band):
+        """
+        `solveBorders` on the rows of `band`.
+        """
+        raise(NotImplementedError)
+
+    def solveInstantBand(self, rippletank, previous, current, following, band):
+        """
+        `solveInstant` on the rows of `band`.
+        """
+        raise(NotImplementedError)
+
+class NumpyBackend(Backend):
+    """
+    Reference backend, made of in place NumPy operations. NumPy releases the GIL
+    on large arrays, thus bands run in parallel when `n_threads` is larger than one.
+    """
+    name = 'numpy'
+
+    def calcSpeedBand(self, rippletank, values, band, ratios = True):
+        tank = rippletank
+        cells = (Ellipsis, slice(*band['rows']), slice(*band['columns']))
+        if np.ndim(values) != 0:
+            values = values[cells]
+        speed, courantx, couranty = tank.speed[cells], tank.courantx[cells], tank.couranty[cells]
+        np.add(values, tank.masked_deep[cells], out = speed)
+        np.maximum(speed, 0, out = speed)
+        np.multiply(speed, tank.g, out = speed)
+        np.sqrt(speed, out = speed)
+
+        np.multiply(speed, tank.dt, out = courantx)
+        np.divide(courantx, tank.dx, out = courantx)
+        np.multiply(speed, tank.dt, out = couranty)
+        np.divide(couranty, tank.dy, out = couranty)
+        if ratios:
+            np.multiply(courantx, courantx, out = tank.ratiox[cells])
+            np.multiply(couranty, couranty, out = tank.ratioy[cells])
+        np.equal(speed, 0, out = tank.dry[cells])
+
+    def secondPartBand(self, rippletank, current, out, band):
+        tank = rippletank
+        first, last = band['rows']
+        first, last = max(first, 1), min(last, current.shape[-2] - 1)
+        left, right = band['columns']
+        left, right = max(left, 1), min(right, current.shape[-1] - 1)
+        if first >= last or left >= right:
+            return
+        double, temp = band['inner'][:2]
+        inner = out[..., first:last, left:right]
+        np.multiply(current[..., first:last, left:right], 2, out = double)
+
+        np.subtract(current[..., first:last, left-1:right-1], double, out = inner)
+        np.add(inner, current[..., first:last, left+1:right+1], out = inner)
+        np.subtract(current[..., first-1:last-1, left:right], double, out = temp)
+        np.add(temp, current[..., first+1:last+1, left:right], out = temp)
+        for order in range(4, tank.order + 1, 2):
+            self.highOrderBand(current, inner, temp, (first, last, left, right), order, band['inner'][2])
+
+        np.multiply(tank.ratiox[..., first:last, left:right], inner, out = inner)
+        np.multiply(tank.ratioy[..., first:last, left:right], temp, out = temp)
+        np.add(inner, temp, out = inner)
+
+    def highOrderBand(self, current, inner, temp, cells, order, scratch):
+        """
+        Overwrites the differences on x, `inner`, and on y, `temp`, of the interior `cells`,
+        (first, last, left, right) rows and columns, with the ones of `order` on the cells
+        where the stencil fits.
+        """
+        coefs = STENCILS[order]
+        half = order//2
+        first, last, left, right = cells
+        n_rows, n_columns = current.shape[-2:]
+        begin, end = max(left, half), min(right, n_columns - half)
+        if begin < end:
+            target = inner[..., begin-left:end-left]
+            work = scratch[..., begin-left:end-left]
+            np.multiply(current[..., first:last, begin:end], coefs[0], out = target)
+            for m in range(1, half + 1):
+                np.add(current[..., first:last, begin-m:end-m],
+                        current[..., first:last, begin+m:end+m], out = work)
+                np.multiply(work, coefs[m], out = work)
+                np.add(target, work, out = target)
+
+        start, stop = max(first, half), min(last, n_rows - half)
+        if start < stop:
+            target = temp[..., start-first:stop-first, :]
+            work = scratch[..., start-first:stop-first, :]
+            np.multiply(current[..., start:stop, left:right], coefs[0], out = target)
+            for m in range(1, half + 1):
+                np.add(current[..., start-m:stop-m, left:right], current[..., start+m:stop+m, left:right], out = work)
+                np.multiply(work, coefs[m], out = work)
+                np.add(target, work, out = target)
+
+    def heightBand(self, rippletank, current, out, band):
+        """
+        Adds to the interior of `out`, on the rows of `band`, the differences of the wave
+        height term of nonlinear tanks, `div(g*height*grad(height))` times `dt**2`, in flux
+        form: the height on the faces between points is the mean of the ones of the points.
+        Dry points have the height that makes them zero deep.
+        """
+        tank = rippletank
+        first, last = band['rows']
+        first, last = max(first, 1), min(last, current.shape[-2] - 1)
+        left, right = band['columns']
+        left, right = max(left, 1), min(right, current.shape[-1] - 1)
+        if first >= last or left >= right:
+            return
+        deep = tank.masked_deep
+        flux, height, work = band['inner'][:3]
+
+        def wet(cells, out):
+            np.add(current[cells], deep[cells], out = out)
+            np.maximum(out, 0, out = out)
+            np.subtract(out, deep[cells], out = out)
+
+        center = (Ellipsis, slice(first, last), slice(left, right))
+        target = out[center]
+        for ahead, behind, step in (((Ellipsis, slice(first, last), slice(left+1, right+1)),
+                                     (Ellipsis, slice(first, last), slice(left-1, right-1)), tank.dx),
+                                    ((Ellipsis, slice(first+1, last+1), slice(left, right)),
+                                     (Ellipsis, slice(first-1, last-1), slice(left, right)), tank.dy)):
+            # twice the flux through the face ahead, on `flux`, and through the one behind, on `height`
+            wet(center, flux)
+            wet(ahead, work)
+            np.add(flux, work, out = flux)
+            np.subtract(current[ahead], current[center], out = work)
+            np.multiply(flux, work, out = flux)
+            wet(center, height)
+            wet(behind, work)
+            np.add(height, work, out = height)
+            np.subtract(current[center], current[behind], out = work)
+            np.multiply(height, work, out = height)
+            np.subtract(flux, height, out = flux)
+            np.multiply(flux, tank.g*tank.dt*tank.dt/(2*step*step), out = flux)
+            np.add(target, flux, out = target)
+
+    def solveBordersBand(self, rippletank, current, following, band):
+        tank = rippletank
+        first, last = band['rows']
+        left, right = band['columns']
+        n_rows, n_columns = current.shape[-2:]
+        columns = slice(left, right)
+        row, column = band['row'], band['column']
+        if tank.bc != 'open':
+            if first == 0:
+                following[..., 0, columns] = 0
+            if last == n_rows:
+                following[..., -1, columns] = 0
+            if left == 0:
+                following[..., first:last, 0] = 0
+            if right == n_columns:
+                following[..., first:last, -1] = 0
+            return
+
+        if first == 0:
+            np.subtract(current[..., 1, columns], current[..., 0, columns], out = row)
+            np.multiply(tank.couranty[..., 0, columns], row, out = row)
+            np.add(row, current[..., 0, columns], out = following[..., 0, columns])
+        if last == n_rows:
+            np.subtract(current[..., -1, columns], current[..., -2, columns], out = row)
+            np.multiply(tank.couranty[..., -1, columns], row, out = row)
+            np.subtract(current[..., -1, columns], row, out = following[..., -1, columns])
+
+        if left == 0:
+            np.subtract(current[..., first:last, 1], current[..., first:last, 0], out = column)
+            np.multiply(tank.courantx[..., first:last, 0], column, out = column)
+            np.add(column, current[..., first:last, 0], out = following[..., first:last, 0])
+        if right == n_columns:
+            np.subtract(current[..., first:last, -1], current[..., first:last, -2], out = column)
+            np.multiply(tank.courantx[..., first:last, -1], column, out = column)
+            np.subtract(current[..., first:last, -1], column, out = following[..., first:last, -1])
+
+    def solveInstantBand(self, rippletank, previous, current, following, band):
+        tank = rippletank
+        self.secondPartBand(tank, current, tank.laplacian, band)
+        if not tank.linear:
+            self.calcSpeedBand(tank, current, band, ratios = False)
+            self.heightBand(tank, current, tank.laplacian, band)
+
+        first, last = band['rows']
+        first, last = max(first, 1), min(last, current.shape[-2] - 1)
+        left, right = band['columns']
+        left, right = max(left, 1), min(right, current.shape[-1] - 1)
+        if first < last and left < right:
+            inner = following[..., first:last, left:right]
+            np.multiply(current[..., first:last, left:right], 2, out = inner)
+            np.subtract(inner, previous[..., first:last, left:right], out = inner)
+            np.add(inner, tank.laplacian[..., first:last, left:right], out = inner)
+        self.pmlBand(tank, previous, current, following, band)
+        self.solveBordersBand(tank, current, following, band)
+
+        cells = (Ellipsis, slice(*band['rows']), slice(*band['columns']))
+        np.copyto(following[cells], 0, where = tank.dry[cells])
+
+def fusedInstant(previous, current, following, deep, speed, dry, g, dt, dx, dy, heightx, heighty,
+                is_open, linear, first, last, left, right):
+    """
+    Single loop over the rows `first` to `last` and the columns `left` to `right` doing
+    the speed update, the interior update and the boundaries update of
+    `NumpyBackend.solveInstant`, with the same operations order. `heightx` and `heighty`
+    are `g*dt**2/(2*dx**2)` and `g*dt**2/(2*dy**2)`, the scales of the wave height term
+    of nonlinear tanks (see `NumpyBackend.heightBand`).
+    """
+    n_y, n_x = current.shape
+    zero = g - g # zero with the precision of the grids
+    for j in range(first, last):
+        for k in range(left, right):
+            if linear:
+                value = speed[j, k]
+            else:
+                value = np.sqrt(max(current[j, k] + deep[j, k], zero)*g)
+                speed[j, k] = value
+                dry[j, k] = value == 0
+            if value == 0:
+                following[j, k] = 0
+                continue
+
+            courantx = value*dt/dx
+            couranty = value*dt/dy
+            if 0 < j < n_y - 1 and 0 < k < n_x - 1:
+                double = current[j, k] + current[j, k]
+                if linear:
+                    inner = courantx*courantx*((current[j, k-1] - double) + current[j, k+1])
+                    temp = couranty*couranty*((current[j-1, k] - double) + current[j+1, k])
+                    following[j, k] = (double - previous[j, k]) + (inner + temp)
+                    continue
+
+                # the differences of the deep use the speed of still water
+                still = np.sqrt(max(deep[j, k], zero)*g)
+                stillx, stilly = still*dt/dx, still*dt/dy
+                inner = stillx*stillx*((current[j, k-1] - double) + current[j, k+1])
+                temp = stilly*stilly*((current[j-1, k] - double) + current[j+1, k])
+                center = max(current[j, k] + deep[j, k], zero) - deep[j, k]
+                ahead = max(current[j, k+1] + deep[j, k+1], zero) - deep[j, k+1]
+                behind = max(current[j, k-1] + deep[j, k-1], zero) - deep[j, k-1]
+                fluxx = ((center + ahead)*(current[j, k+1] - current[j, k])
+                         - (center + behind)*(current[j, k] - current[j, k-1]))*heightx
+                ahead = max(current[j+1, k] + deep[j+1, k], zero) - deep[j+1, k]
+                behind = max(current[j-1, k] + deep[j-1, k], zero) - deep[j-1, k]
+                fluxy = ((center + ahead)*(current[j+1, k] - current[j, k])
+                         - (center + behind)*(current[j, k] - current[j-1, k]))*heighty
+                following[j, k] = (double - previous[j, k]) + (((inner + temp) + fluxx) + fluxy)
+            elif is_open:
+                if k == 0:
+                    following[j, k] = courantx*(current[j, 1] - current[j, 0]) + current[j, 0]
+                elif k == n_x - 1:
+                    following[j, k] = current[j, k] - courantx*(current[j, k] - current[j, k-1])
+                elif j == 0:
+                    following[j, k] = couranty*(current[1, k] - current[0, k]) + current[0, k]
+                else:
+                    following[j, k] = current[j, k] - couranty*(current[j, k] - current[j-1, k])
+            else:
+                following[j, k] = 0
+
+class NumbaBackend(NumpyBackend):
+    """
+    Backend that fuses the speed update, the interior update and the open boundaries
+    update in a single compiled loop over the grid, reading every array once per instant.
+    The compiled loop releases the GIL, so bands also run in parallel. Only second order
+    differences are compiled, higher orders use `NumpyBackend`. Requires numba.
+    """
+    name = 'numba'
+    kernels = {} #: compiled kernels, shared by all instances
+
+    @classmethod
+    def isAvailable(cls):
+        return numba is not None
+
+    def __init__(self):
+        NumpyBackend.__init__(self)
+        if not 'instant' in self.kernels:
+            self.kernels['instant'] = numba.njit(nogil = True)(fusedInstant)
+        self.kernel = self.kernels['instant'] #: compiled `fusedInstant`
+
+    def solveInstantBand(self, rippletank, previous, current, following, band):
+        tank = rippletank
+        if tank.order != 2:
+            return NumpyBackend.solveInstantBand(self, tank, previous, current, following, band)
+        first, last = band['rows']
+        left, right = band['columns']
+        scalar = tank.dtype.type
+        self.kernel(previous, current, following, tank.masked_deep, tank.speed, tank.dry,
+                    scalar(tank.g), scalar(tank.dt), scalar(tank.dx), scalar(tank.dy),
+                    scalar(tank.g*tank.dt*tank.dt/(2*tank.dx*tank.dx)), scalar(tank.g*tank.dt*tank.dt/(2*tank.dy*tank.dy)),
+                    tank.bc == 'open', tank.linear, first, last, left, right)
+        self.pmlBand(tank, previous, current, following, band)
+
+registerBackend(NumpyBackend.name, NumpyBackend)
+registerBackend(NumbaBackend.name, NumbaBackend)
@@ -0,0 +1,188 @@
+import numpy as np
+
+from .tank import RippleTank
+from .backends import NumpyBackend
+from .sources import sineSource, squareSource, dropSource
+
+__all__ = ['TankBatch']
+
+SINE, SQUARE, DROP, OTHER = range(4) #: kinds of sources evaluated by `TankBatch`
+
+class TankBatch():
+    """
+    TankBatches step many `RippleTank` configurations that share the same grid at once.
+    Configurations are stacked along a leading axis and solved by a single vectorized
+    update, with per member `dt`, `masked_deep` and source parameters stored as arrays.
+    Results are the same as solving every tank on its own.
+    """
+    def __init__(self, tanks, n_threads = 1):
+        if len(tanks) == 0:
+            raise(Exception("At least one tank is required."))
+        first = tanks[0]
+        for tank in tanks:
+            if tank.X.shape != first.X.shape or tank.dx != first.dx or tank.dy != first.dy or tank.dtype != first.dtype:
+                raise(Exception("Tanks do not share the same grid."))
+            if tank.bc != first.bc or tank.pml_width != first.pml_width or tank.g != first.g or tank.linear != first.linear or tank.order != first.order:
+                raise(Exception("Tanks do not share the same boundary conditions, units, linear mode and order."))
+            if tank.lts_levels > 1:
+                raise(Exception("Tanks with local time stepping can not be batched."))
+
+        self.tanks = list(tanks) #: tanks on the batch
+        self.n_members = len(tanks) #: number of tanks
+        self.dx = first.dx #: dx value
+        self.dy = first.dy #: dy value
+        self.g = first.g #: gravity value
+        self.bc = first.bc #: boundary conditions
+        self.pml_width = first.pml_width #: cells of the perfectly matched layer
+        self.pml = None #: damping profiles of the perfectly matched layer of every member
+        if first.pml is not None:
+            self.pml = [np.array([tank.pml[axis] for tank in tanks]) for axis in range(2)]
+        self.order = first.order #: order of the central differences
+        self.linear = first.linear #: if True the propagation speed depends only on the deep
+        self.n_threads = n_threads #: number of threads used for stepping
+        self.backend = NumpyBackend() #: backend used for stepping
+
+        self.X = np.zeros((self.n_members, ) + first.X.shape, dtype = first.dtype) #: used by backends to get the shape
+        self.dt = np.array([tank.dt for tank in tanks], dtype = first.dtype).reshape(-1, 1, 1) #: dt of every member
+        self.dtype = first.dtype #: floating point type of the simulation arrays
+        self.masked_deep = np.array([tank.masked_deep*np.ones_like(first.X) for tank in tanks], dtype = first.dtype) #: deep of every member
+        self.levels = None #: three time levels of every member
+        self.work = None #: work buffers of every band of rows used while stepping
+        self.active = None #: all the cells of every member are stepped
+
+    def prepareSources(self):
+        """
+        Gathers the sources of all the members. Built in functions are stored as arrays
+        of kinds, frequencies, phases and scales; other functions are evaluated one by one.
+        """
+        size = self.X[0].size
+        kinds = {sineSource: SINE, squareSource: SQUARE, dropSource: DROP}
+        cells, owners = [], []
+        self.source_kind, self.source_freq, self.source_phase = [], [], []
+        self.source_scale, self.source_dt, self.other_sources = [], [], []
+        for member, tank in enumerate(self.tanks):
+            tank.forbidden_pos = tank.getSourcesPositions()
+            for source in tank.sources:
+                positions = source.indices
+                cells += [positions + member*size]
+                owners += [np.full(len(positions), len(self.source_kind))]
+                kind = OTHER
+                if np.ndim(source.freq) == 0:
+                    kind = kinds.get(source.function, OTHER)
+                if kind == OTHER:
+                    start = sum(len(cell) for cell in cells[:-1])
+                    self.other_sources += [(start, source, positions)]
+                    self.source_freq += [0]
+                    self.source_phase += [0]
+                    self.source_scale += [(0, 0)]
+                else:
+                    self.source_freq += [source.freq]
+                    self.source_phase += [source.phase]
+                    self.source_scale += [(source.amplitude, tank.deep)]
+                self.source_kind += [kind]
+                self.source_dt += [tank.dt]
+
+        self.source_kind = np.array(self.source_kind, dtype = int) #: kind of every source
+        self.source_freq = np.array(self.source_freq, dtype = float) #: frequency of every source
+        self.source_phase = np.array(self.source_phase, dtype = float) #: phase of every source
+        self.source_scale = np.array(self.source_scale, dtype = float).reshape(-1, 2) #: amplitude and deep of every source
+        self.source_dt = np.array(self.source_dt, dtype = float) #: dt of the member of every source
+
+        cells = np.concatenate(cells) if len(cells) else np.zeros(0, dtype = int)
+        self.source_owners = np.concatenate(owners) if len(owners) else np.zeros(0, dtype = int) #: source of every cell
+        self.source_cells, self.source_slots = np.unique(cells, return_inverse = True) #: cells with sources and slot of every cell
+
+    def evaluateSources(self, i):
+        """
+        Evaluates all the sources of all the members.
+
+        Returns:
+            np.ndarray: values on `source_cells` at the i instant.
+        """
+        t = self.source_dt*i
+        values = np.sin(2*np.pi*self.source_freq*t + self.source_phase)
+        values = np.where(self.source_kind == SQUARE, np.sign(values), values)
+        values = np.where(self.source_kind == DROP, np.where(t == 0, -1.0, 0.0), values)
+        values = values*self.source_scale[:, 0]*self.source_scale[:, 1]
+
+        weights = values[self.source_owners]
+        for start, source, positions in self.other_sources:
+            weights[start:start + len(positions)] = source.sample(i)
+        return np.bincount(self.source_slots, weights = weights, minlength = len(self.source_cells))
+
+    def applySources(self, i, level):
+        """
+        Sets the sources values of the instant `i` in the amplitude arrays `level`.
+        """
+        level.reshape(-1)[self.source_cells] = self.evaluateSources(i)
+
+    def iterLevels(self, n_instants):
+        """
+        Generator equivalent to `RippleTank.iterLevels` for all the members at once.
+
+        Yields:
+            int: instant index.
+            np.ndarray: 3d amplitude values at that instant, first dimension represents members.
+        """
+        if n_instants < 2:
+            raise(Exception("At least two instants are required."))
+
+        self.backend.prepare(self)
+        self.backend.calcSpeed(self, 0)
+        self.prepareSources()
+        self.levels = [np.zeros_like(self.X) for i in range(3)]
+        previous, current, following = self.levels
+        self.applySources(0, previous)
+        current[:] = previous
+        yield 0, previous
+
+        for i in range(1, n_instants-1):
+            self.backend.solveInstant(self, previous, current, following)
+            if i == 1:
+                self.applySources(1, current)
+            self.applySources(i+1, following)
+            yield i, current
+
+            previous, current, following = current, following, previous
+            self.levels = [previous, current, following]
+
+        yield n_instants - 1, current
+
+    def iterInterpolated(self, n_instants, instants):
+        """
+        Generator equivalent to `RippleTank.iterInterpolated` for all the members at once.
+
+        Yields:
+            float: instant index.
+            np.ndarray: 3d amplitude values at that instant, first dimension represents members.
+        """
+        # only iterLevels, X and dtype are used, which have the shapes of the batch
+        return RippleTank.iterInterpolated(self, n_instants, instants)
+
+    def solvePoints(self, n_instants, record = 1):
+        """
+        Simulates `n_instants` of time on all the members, frames are stored following
+        the `record` policy (see `RippleTank.recordedInstants`), fractional instants are
+        interpolated. Every member gets its `amplitude`, `complete_values` and `recorded`
+        attributes as if solved on its own.
+
+        Returns:
+            np.ndarray: 4d array, dimensions represent members, time, y and x.
+        """
+        recorded = self.tanks[0].recordedInstants(n_instants, record)
+        amplitude = np.zeros((self.n_members, len(recorded)) + self.X.shape[1:], dtype = self.X.dtype)
+        if recorded.dtype.kind == 'f':
+            for k, (i, level) in enumerate(self.iterInterpolated(n_instants, recorded)):
+                amplitude[:, k] = level
+        else:
+            frames = dict(zip(recorded, range(len(recorded))))
+            for i, level in self.iterLevels(n_instants):
+                if i in frames:
+                    amplitude[:, frames[i]] = level
+
+        for member, tank in enumerate(self.tanks):
+            tank.recorded = recorded
+            tank.amplitude = amplitude[member]
+            tank.complete_values = tank.amplitude + tank.masked_deep
+            tank.levels = [level[member].copy() for level in self.levels]
+        return amplitude + self.masked_deep[:, None]
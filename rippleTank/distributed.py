@@ -0,0 +1,160 @@
+import numpy as np
+import multiprocessing as mp
+from threading import BrokenBarrierError
+
+from .backends import getBackend, splitRows
+
+__all__ = ['DistributedSolver', 'Subdomain']
+
+class Subdomain():
+    """
+    Subdomains are the part of a `RippleTank` stepped by a single process. They hold
+    the rows owned by the process plus a halo of half the stencil width on each side, one row
+    wider with a perfectly matched layer, whose auxiliary fields are solved redundantly on it, as views of the
+    time levels stored on shared memory, so that halos are exchanged by just
+    synchronizing the processes once per instant.
+    """
+    def __init__(self, rippletank, levels, rows):
+        n_rows = levels.shape[1]
+        width = rippletank.order//2 + (rippletank.bc == 'pml')
+        self.rows = rows #: first and last (excluded) rows owned on the tank
+        self.halo = (max(rows[0] - width, 0), min(rows[1] + width, n_rows)) #: rows including the halo
+        self.levels = levels[:, self.halo[0]:self.halo[1]] #: views of the three time levels
+        self.owned = (rows[0] - self.halo[0], rows[1] - self.halo[0]) #: owned rows on `levels`
+
+        self.X = self.levels[0] #: used by backends to get the shape
+        self.masked_deep = np.ascontiguousarray(rippletank.masked_deep[self.halo[0]:self.halo[1]]) #: deep on every point
+        self.g = rippletank.g #: gravity value
+        self.dtype = rippletank.dtype #: floating point type of the simulation arrays
+        self.dt = rippletank.dt #: dt value
+        self.dx = rippletank.dx #: dx value
+        self.dy = rippletank.dy #: dy value
+        self.bc = rippletank.bc #: boundary conditions
+        self.pml_width = rippletank.pml_width #: cells of the perfectly matched layer
+        self.pml = None #: damping profiles of the perfectly matched layer
+        if rippletank.pml is not None:
+            self.pml = [np.ascontiguousarray(profile[self.halo[0]:self.halo[1]]) for profile in rippletank.pml]
+        self.order = rippletank.order #: order of the central differences
+        self.linear = rippletank.linear #: if True the propagation speed depends only on the deep
+        self.n_threads = 1 #: threads used by the backend
+        self.active = None #: all the rows of the subdomain are stepped
+
+        self.backend = getBackend(rippletank.backend.name) #: backend used for stepping
+        self.backend.prepare(self, self.owned)
+        self.backend.calcSpeed(self, 0)
+
+    def solveInstant(self, i):
+        """
+        Writes the owned rows of the instant i+1 using the instants i and i-1.
+        """
+        previous, current, following = [self.levels[j%3] for j in (i-1, i, i+1)]
+        self.backend.solveInstant(self, previous, current, following)
+
+def stepSubdomain(rippletank, memory, shape, rows, instant, start, done):
+    """
+    Loop of every process: waits for the main process, steps its subdomain and
+    waits for the other processes. Stops when `instant` is negative.
+    """
+    try:
+        levels = np.frombuffer(memory, dtype = rippletank.dtype).reshape(shape)
+        subdomain = Subdomain(rippletank, levels, rows)
+        while True:
+            start.wait()
+            i = instant[0]
+            if i < 0:
+                break
+            subdomain.solveInstant(i)
+            done.wait()
+    except BrokenBarrierError:
+        pass
+    except:
+        start.abort()
+        done.abort()
+        raise
+
+class DistributedSolver():
+    """
+    DistributedSolvers step a `RippleTank` with `n_processes` processes. The tank is
+    partitioned in bands of rows, every process owns one of them and writes only its
+    rows of the time levels, which live on shared memory. Masks and open boundaries
+    are solved by the owner of each row, while sources are applied by the main process
+    between instants. Results are the same as with a single process, and so are
+    checkpoints, except for tanks with a perfectly matched layer, whose auxiliary fields
+    are private to the processes.
+    """
+    def __init__(self, rippletank, n_processes):
+        self.rippletank = rippletank #: parent tank
+        self.n_processes = n_processes #: number of processes
+
+    def iterLevels(self, n_instants):
+        """
+        Generator equivalent to `RippleTank.iterLevels`, using `n_processes` processes.
+
+        Yields:
+            int: instant index.
+            np.ndarray: 2d amplitude values at that instant.
+        """
+        tank = self.rippletank
+        if tank.bc == 'pml' and tank.checkpoint_state is not None:
+            raise(Exception("Checkpoints of 'pml' tanks require n_processes = 1."))
+        if tank.lts_levels > 1:
+            raise(Exception("Local time stepping requires n_processes = 1."))
+        shape = (3, ) + tank.X.shape
+        methods = mp.get_all_start_methods()
+        context = mp.get_context('fork' if 'fork' in methods else None)
+
+        # the shared memory is freed with the last view of it, thus yielded levels stay valid
+        memory = context.RawArray('b', int(np.prod(shape))*tank.dtype.itemsize)
+        levels = np.frombuffer(memory, dtype = tank.dtype).reshape(shape)
+        instant = context.RawArray('q', 1)
+        start = context.Barrier(self.n_processes + 1)
+        done = context.Barrier(self.n_processes + 1)
+
+        processes = []
+        for rows in splitRows(0, shape[1], self.n_processes):
+            process = context.Process(target = stepSubdomain,
+                        args = (tank, memory, shape, rows, instant, start, done))
+            process.daemon = True
+            process.start()
+            processes += [process]
+
+        tank.step = 0
+        try:
+            tank.prepareSources()
+            first = tank.firstInstant()
+            first = tank.restoreLevels(n_instants, levels[(first - 1)%3], levels[first%3])
+            if first == 0:
+                tank.applySources(0, levels[0])
+                levels[1] = levels[0]
+                tank.levels = [levels[0], levels[1], levels[2]]
+                tank.step = first = 1
+                yield 0, levels[0]
+
+            for i in range(first, n_instants-1):
+                instant[0] = i
+                start.wait()
+                done.wait()
+                if i == 1:
+                    tank.applySources(1, levels[1])
+                tank.applySources(i+1, levels[(i+1)%3])
+                tank.levels = [levels[j%3] for j in (i, i + 1, i + 2)]
+                tank.step = i + 1
+                tank.autoCheckpoint()
+                yield i, levels[i%3]
+
+            i = n_instants - 1
+            yield i, levels[i%3]
+        except BrokenBarrierError:
+            raise(Exception("A subdomain process failed."))
+        finally:
+            i = tank.step
+            tank.levels = [np.array(levels[j%3]) for j in (i - 1, i, i + 1)]
+            instant[0] = -1
+            try:
+                start.wait(timeout = 10)
+            except BrokenBarrierError:
+                pass
+            for process in processes:
+                process.join(timeout = 10)
+                if process.is_alive():
+                    process.terminate()
@@ -0,0 +1,189 @@
+import warnings
+import numpy as np
+
+__all__ = ['LocalTimeStepper']
+
+def dilate(values, reach):
+    """
+    Maximum of `values` over the square of `reach` cells around every point.
+
+    Returns:
+        np.ndarray: 2d array.
+    """
+    out = values.copy()
+    for axis in (0, 1):
+        source = out.copy()
+        for shift in range(1, reach + 1):
+            lower, upper = [slice(None)]*2, [slice(None)]*2
+            lower[axis], upper[axis] = slice(shift, None), slice(None, -shift)
+            lower, upper = tuple(lower), tuple(upper)
+            np.maximum(out[lower], source[upper], out = out[lower])
+            np.maximum(out[upper], source[lower], out = out[upper])
+    return out
+
+def boundingBox(cells):
+    """
+    Returns:
+        tuple: (top, bottom, left, right) box of the True points of `cells`, with bottom
+        and right excluded, None if there are none.
+    """
+    rows, columns = np.flatnonzero(cells.any(axis = 1)), np.flatnonzero(cells.any(axis = 0))
+    if len(rows) == 0:
+        return None
+    return (rows[0], rows[-1] + 1, columns[0], columns[-1] + 1)
+
+def boxSlices(box):
+    """
+    Returns:
+        tuple: row and column slices of `box`.
+    """
+    return (slice(box[0], box[1]), slice(box[2], box[3]))
+
+class LocalTimeStepper():
+    """
+    LocalTimeSteppers step a linear `RippleTank` with a `dt` larger than the stable one of
+    its deepest points. Points are grouped on levels by depth: the points of the level l
+    are stable with `dt/2**l`, and the levels of the stencil neighbours of a point are
+    raised to its level, so that interfaces between levels have a layer of points of both.
+    Source points are on the level 0, as their values are only set on the instants of `dt`,
+    which must still resolve the period of the sources. Sources on water two or more levels
+    finer excite the fast modes of its points with the coarse `dt` and lose accuracy, thus a
+    warning is emitted for them.
+
+    Every instant is the leapfrog `2*current - previous - G(current)`, where G replaces the
+    differences times `dt**2` with the stabilized local time stepping of Grote, Mehlin and
+    Sauter: on every level, the differences of its points plus the ones of the finer levels
+    are filtered by a damped Chebyshev polynomial of degree two of the finer levels, thus
+    the level l takes `2**l` differences per instant, as many as steps of `dt/2**l`. The
+    damping, `stabilization`, keeps the interfaces between levels stable. Every level is
+    solved on the box of its points and their neighbours, thus the cost follows the size of
+    the deep regions. The scheme is second order and is the leapfrog of the whole tank when
+    all the points are on the level 0. Open boundaries are sub-cycled with the step of their
+    level, interpolating the inner points along the instant. Tanks with a perfectly matched
+    layer are not supported.
+    """
+    def __init__(self, rippletank, stabilization = 0.1):
+        tank = rippletank
+        if not tank.linear:
+            raise(Exception("Local time stepping requires linear tanks."))
+        if tank.bc == 'pml':
+            raise(Exception("Local time stepping does not support 'pml' boundaries."))
+        self.rippletank = tank #: parent tank
+        self.reach = tank.order//2 #: half the stencil width
+        self.stabilization = stabilization #: damping of the Chebyshev polynomials
+        delta = 1 + stabilization/4.0
+        self.weight = (2*delta*delta - 1)/(16*delta*delta) #: weight of the finer levels applied twice
+
+        shape = tank.X.shape
+        speed = np.sqrt(tank.g*np.maximum(tank.masked_deep*np.ones(shape), 0))
+        courant = speed*tank.dt/(tank.alpha*min(tank.dx, tank.dy))
+        # the tolerance keeps on its level a point whose `dt/2**l` is exactly the stable one
+        levels = np.ceil(np.log2(np.maximum(courant, 1)) - 1e-9).astype(int)
+        levels = dilate(levels, self.reach)
+        sources = tank.getSourcesPositions()
+        if sources.any() and levels[sources].max() > 1:
+            warnings.warn("Sources on water needing steps of dt/%d are forced with dt, use fewer lts_levels "
+                        "or place them on shallower water."%2**levels[sources].max())
+        levels[sources] = 0
+        self.levels = levels #: level of every point
+        self.n_levels = int(levels.max()) + 1 #: number of levels
+
+        full = (0, shape[0], 0, shape[1])
+        self.masks = [] #: points of every level, as 0 and 1 values
+        self.cells = [] #: box of the points of every level
+        self.reached = [] #: box of the points reached by the differences of every level
+        self.boxes = [] #: box solved by every level, the one of its points, the finer ones and their neighbours
+        for l in range(self.n_levels):
+            cells = levels == l
+            self.masks += [cells.astype(tank.dtype)]
+            self.cells += [boundingBox(cells)]
+            self.reached += [boundingBox(dilate(cells, self.reach))]
+            self.boxes += [full if l == 0 else boundingBox(dilate(levels >= l, self.reach))]
+
+        buffers = lambda: [np.zeros(shape, dtype = tank.dtype) for l in range(self.n_levels)]
+        self.masked = buffers() #: points of every level of the values being differentiated, zero elsewhere
+        self.seconds = buffers() #: differences of `masked`
+        self.outputs = buffers() #: G of every level
+
+        self.borders = [] #: flat indices, inner neighbours, Courant numbers and steps of the open boundaries
+        if tank.bc == 'open':
+            index = np.arange(tank.X.size).reshape(shape)
+            # rows first, then columns, which include the corners
+            sides = (((0, slice(1, -1)), (1, slice(1, -1)), 'couranty'),
+                     ((-1, slice(1, -1)), (-2, slice(1, -1)), 'couranty'),
+                     ((slice(None), 0), (slice(None), 1), 'courantx'),
+                     ((slice(None), -1), (slice(None), -2), 'courantx'))
+            for cells, inward, name in sides:
+                steps = 2**levels[cells]
+                self.borders += [(index[cells], index[inward], getattr(tank, name)[cells]/steps, steps)]
+
+    def solveInstant(self, previous, current, following):
+        """
+        Writes on `following` the state after `current`, which in turn comes after `previous`.
+        """
+        tank = self.rippletank
+        effective = self.effective(0, current)
+        np.multiply(current, 2, out = following)
+        np.subtract(following, previous, out = following)
+        np.subtract(following, effective, out = following)
+        self.solveBorders(current, following)
+        np.copyto(following, 0, where = tank.dry)
+
+    def differentiate(self, l, values):
+        """
+        Writes on `seconds[l]` the differences of the points of the level `l` of `values`.
+        """
+        if self.cells[l] is None:
+            return
+        tank = self.rippletank
+        cells = boxSlices(self.cells[l])
+        np.multiply(values[cells], self.masks[l][cells], out = self.masked[l][cells])
+        active = tank.active
+        tank.active = self.reached[l]
+        try:
+            tank.backend.secondPart(tank, self.masked[l], self.seconds[l])
+        finally:
+            tank.active = active
+
+    def effective(self, l, values):
+        """
+        Evaluates G of the level `l`, the differences times `(dt/2**l)**2` of the points of
+        `values` on the level `l` and the finer ones, filtered by the finer levels.
+
+        Returns:
+            np.ndarray: `outputs[l]`, written on the box of the level `l`.
+        """
+        cells = boxSlices(self.boxes[l])
+        out = self.outputs[l]
+        self.differentiate(l, values)
+        np.multiply(self.seconds[l][cells], -0.25**l, out = out[cells])
+        if l + 1 == self.n_levels:
+            return out
+
+        # out + 4*G(out) and out - 4*weight*G(out) of the finer levels, which only change their box
+        inner = boxSlices(self.boxes[l + 1])
+        finer = self.effective(l + 1, values)
+        np.multiply(finer[inner], 4, out = finer[inner])
+        np.add(out[inner], finer[inner], out = out[inner])
+        finer = self.effective(l + 1, out)
+        np.multiply(finer[inner], 4*self.weight, out = finer[inner])
+        np.subtract(out[inner], finer[inner], out = out[inner])
+        return out
+
+    def solveBorders(self, current, following):
+        """
+        Writes the open boundaries of `following`, with `2**l` steps on the points of the
+        level l, using the inner points of `current` and `following` interpolated along
+        the instant.
+        """
+        if self.rippletank.bc != 'open':
+            following[[0, -1], :] = following[:, [0, -1]] = 0
+            return
+        current, following = current.reshape(-1), following.reshape(-1)
+        for cells, inward, courant, steps in self.borders:
+            values = current[cells]
+            start, end = current[inward], following[inward]
+            for m in range(int(steps.max())):
+                neighbours = start + (end - start)*(m/steps)
+                values = np.where(m < steps, values + courant*(neighbours - values), values)
+            following[cells] = values
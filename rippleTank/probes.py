@@ -0,0 +1,289 @@
+import numpy as np
+from .masks import getPositions
+
+__all__ = ['Probe', 'LineProbe', 'RegionProbe', 'FieldStatistics', 'SteadyStateMonitor']
+
+def closestCells(rippletank, x, y):
+    """
+    Finds the points of the grid closest to the `x`, `y` coordinates.
+
+    Raises:
+        Exception: "Probes must be inside the ripple tank."
+
+    Returns:
+        np.ndarray: 1d array with the flat indices of the points.
+    """
+    x, y = np.broadcast_arrays(np.atleast_1d(x), y)
+    xdim, ydim = rippletank.xdim, rippletank.ydim
+    if (x < min(xdim)).any() or (x > max(xdim)).any() or (y < min(ydim)).any() or (y > max(ydim)).any():
+        raise(Exception("Probes must be inside the ripple tank."))
+    columns = np.abs(rippletank.X[0] - x.reshape(-1, 1)).argmin(axis = 1)
+    rows = np.abs(rippletank.Y[:, 0] - y.reshape(-1, 1)).argmin(axis = 1)
+    return rows*rippletank.X.shape[1] + columns
+
+class Probe():
+    """
+    Probes record the amplitude on some points of the tank every `every` instants of the
+    simulations, without storing whole frames. This one records the point of the grid
+    closest to `x`, `y`, thus `values` is a 1d array, or the points closest to each
+    pair when `x` and `y` are arrays, adding their dimensions to `values`.
+    """
+    def __init__(self, rippletank, x, y, every = 1):
+        if int(every) != every or every < 1:
+            raise(Exception("every must be a positive int."))
+        self.rippletank = rippletank #: parent tank
+        self.x = x #: x coordinate of the probe
+        self.y = y #: y coordinate of the probe
+        self.every = int(every) #: instants between records
+        self.cells = closestCells(rippletank, x, y) #: flat indices of the recorded points
+        self.shape = np.broadcast(x, y).shape #: shape of a single record
+        self.instants = None #: instants recorded on the last simulation
+        self.times = None #: time of every record
+        self.values = None #: records of the last simulation, first dimension represents time
+        self.n_records = 0 #: records taken on the running simulation
+
+        self.rippletank.addProbe(self)
+
+    def start(self, first, n_instants):
+        """
+        Allocates the records of a simulation going from the instant `first` to `n_instants`.
+        """
+        first = first + (-first)%self.every
+        self.instants = np.arange(first, n_instants, self.every)
+        self.times = self.instants*self.rippletank.dt
+        self.values = np.zeros((len(self.instants), ) + self.shape, dtype = self.rippletank.dtype)
+        self.n_records = 0
+
+    def read(self, level):
+        """
+        Returns:
+            np.ndarray: record of the amplitude array `level`.
+        """
+        return level.reshape(-1)[self.cells].reshape(self.shape)
+
+    def sample(self, i, level):
+        """
+        Records the amplitude array `level` if the instant `i` is due to.
+        """
+        if i%self.every == 0:
+            self.values[self.n_records] = self.read(level)
+            self.n_records += 1
+
+    def stop(self):
+        """
+        Drops the records of the instants not simulated, when the simulation is cancelled.
+        """
+        self.instants = self.instants[:self.n_records]
+        self.times = self.times[:self.n_records]
+        self.values = self.values[:self.n_records]
+
+class LineProbe(Probe):
+    """
+    LineProbes record `n_points` equally spaced points of the segment from `start` to `end`,
+    (x, y) tuples, each one on the closest point of the grid. By default there is a
+    point per cell crossed by the segment. `values` is a 2d array, time by points.
+    """
+    def __init__(self, rippletank, start, end, n_points = None, every = 1):
+        if n_points is None:
+            cells = max(abs(end[0] - start[0])/rippletank.dx, abs(end[1] - start[1])/rippletank.dy)
+            n_points = int(np.ceil(cells)) + 1
+        self.start_point = start #: first end of the segment
+        self.end_point = end #: last end of the segment
+        x = np.linspace(start[0], end[0], n_points)
+        y = np.linspace(start[1], end[1], n_points)
+        Probe.__init__(self, rippletank, x, y, every)
+
+class RegionProbe(Probe):
+    """
+    RegionProbes record the points of the rectangle with `xcorners` and `ycorners`.
+    `values` is a 3d array, time by rows by columns, unless a `reduce` function
+    is given, such as `np.mean` or `np.max`, which receives the 1d array of the points
+    on every instant and whose output is recorded instead.
+    """
+    def __init__(self, rippletank, xcorners, ycorners, reduce = None, every = 1):
+        positions = getPositions(rippletank.X, rippletank.Y, xcorners, ycorners)
+        if not positions.any():
+            raise(Exception("The region does not contain any point of the tank."))
+        self.xcorners = xcorners #: xcorners of the region
+        self.ycorners = ycorners #: ycorners of the region
+        self.reduce = reduce #: function applied to the points of every record
+        Probe.__init__(self, rippletank, rippletank.X[positions], rippletank.Y[positions], every)
+        self.cells = np.flatnonzero(positions)
+        self.shape = (positions.any(axis = 1).sum(), positions.any(axis = 0).sum())
+        if reduce is not None:
+            self.shape = np.shape(reduce(np.zeros(len(self.cells))))
+
+    def read(self, level):
+        """
+        Returns:
+            np.ndarray: record of the amplitude array `level`.
+        """
+        values = level.reshape(-1)[self.cells]
+        if self.reduce is None:
+            return values.reshape(self.shape)
+        return self.reduce(values)
+
+class FieldStatistics():
+    """
+    FieldStatistics accumulate maps of the amplitude over the instants from `start` to
+    `stop` (excluded, None for the last instant) of the simulations, updating them in place
+    on every instant, thus memory does not depend on the number of instants. The maximum
+    absolute amplitude, `envelope`, the `mean` and the `rms` height are computed with
+    Welford's running mean and sum of squared deviations, in float64. `energy` is the mean energy
+    density of linear waves per unit mass density, g times the mean squared height, since
+    kinetic and potential energy are equal on average. Maps are restarted by every
+    simulation, and are not part of checkpoints.
+    """
+    def __init__(self, rippletank, start = 0, stop = None):
+        self.rippletank = rippletank #: parent tank
+        self.start_instant = start #: first instant accumulated
+        self.stop_instant = stop #: first instant not accumulated, None for no limit
+        self.n_samples = 0 #: instants accumulated
+        self.envelope = None #: maximum absolute amplitude on every point
+        self.mean = None #: mean amplitude on every point
+        self.squares = None #: sum of the squared deviations from `mean` on every point
+        self.rms = None #: root mean square amplitude on every point
+        self.energy = None #: mean energy density on every point
+        self.values = None #: dictionary with the maps of the last simulation
+        self.work = None #: buffers of the updates
+
+        self.rippletank.addProbe(self)
+
+    def start(self, first, n_instants):
+        """
+        Restarts the maps before a simulation.
+        """
+        shape = self.rippletank.X.shape
+        self.n_samples = 0
+        self.envelope, self.mean, self.squares = [np.zeros(shape) for i in range(3)]
+        self.work = [np.zeros(shape) for i in range(2)]
+        self.rms = self.energy = self.values = None
+
+    def sample(self, i, level):
+        """
+        Accumulates the amplitude array `level` if the instant `i` is on the window.
+        """
+        if i < self.start_instant or (self.stop_instant is not None and i >= self.stop_instant):
+            return
+        self.n_samples += 1
+        delta, scratch = self.work
+        np.subtract(level, self.mean, out = delta)
+        np.multiply(delta, 1.0/self.n_samples, out = scratch)
+        np.add(self.mean, scratch, out = self.mean)
+        np.subtract(level, self.mean, out = scratch)
+        np.multiply(delta, scratch, out = scratch)
+        np.add(self.squares, scratch, out = self.squares)
+        np.abs(level, out = scratch)
+        np.maximum(self.envelope, scratch, out = self.envelope)
+
+    def stop(self):
+        """
+        Computes `rms`, `energy` and `values` from the accumulated maps.
+        """
+        self.work = None
+        if self.n_samples == 0:
+            return
+        meansquare = self.squares/self.n_samples + self.mean**2
+        self.rms = np.sqrt(meansquare)
+        self.energy = self.rippletank.g*meansquare
+        self.values = {'envelope': self.envelope, 'mean': self.mean, 'rms': self.rms, 'energy': self.energy}
+
+class SteadyStateMonitor():
+    """
+    SteadyStateMonitors detect the periodic steady state of the simulations: every
+    `period` seconds, by default the longest period of the sources, the amplitude is taken at
+    the start and a quarter of the cycle, and compared with the one of the previous cycle.
+    When the relative change falls below `tol` the simulation is stopped.
+
+    Cycles do not start on whole instants, thus the amplitude is interpolated between
+    the two instants around them with sines of the `period`, which is exact for the
+    time harmonic state of a sine source and does not depend on `dt`.
+    """
+    def __init__(self, rippletank, tol, period = None):
+        if period is None:
+            if len(rippletank.sources) == 0:
+                raise(Exception("Either a period or sources are required."))
+            period = 1.0/min(np.min(source.freq) for source in rippletank.sources)
+        if period <= 2*rippletank.dt:
+            raise(Exception("The period must be longer than two instants."))
+        self.rippletank = rippletank #: parent tank
+        self.tol = tol #: largest relative change between cycles of the steady state
+        self.period = period #: period of the cycles, in seconds
+        self.instant = None #: instant the steady state was detected on, None if it was not
+        self.level = None #: amplitude on `instant`
+        self.changes = None #: relative change of every cycle
+        self.values = None #: `changes` of the last simulation
+        self.snapshots = None #: amplitude at the start and a quarter of the current and previous cycles
+        self.last = None #: amplitude of the previous instant, when a snapshot falls after it
+        self.n_snapshots = 0 #: snapshots taken on the running simulation
+
+        self.rippletank.addProbe(self)
+
+    def start(self, first, n_instants):
+        """
+        Restarts the detection before a simulation going from the instant `first`.
+        """
+        shape = self.rippletank.X.shape
+        self.instant = self.level = None
+        self.changes = []
+        self.snapshots = [[np.zeros(shape), np.zeros(shape)] for i in range(2)]
+        self.last = np.zeros(shape)
+        self.n_snapshots = 4*int(np.ceil(first*self.rippletank.dt/self.period))
+
+    def snapshotInstant(self):
+        """
+        Returns:
+            float: fractional instant of the next snapshot.
+        """
+        cycle, quarter = divmod(self.n_snapshots, 4)
+        return (cycle + quarter/4.0)*self.period/self.rippletank.dt
+
+    def sample(self, i, level):
+        """
+        Takes the snapshots between the previous instant and the instant `i`.
+
+        Returns:
+            bool: True when the steady state is detected and the simulation must stop.
+        """
+        phase = 2*np.pi*self.rippletank.dt/self.period
+        instant = self.snapshotInstant()
+        while instant <= i:
+            cycle, quarter = divmod(self.n_snapshots, 4)
+            weight = instant - (i - 1)
+            snapshot = self.snapshots[cycle%2][quarter]
+            if weight >= 1:
+                snapshot[:] = level
+            else:
+                np.multiply(level, np.sin(weight*phase)/np.sin(phase), out = snapshot)
+                snapshot += np.sin((1 - weight)*phase)/np.sin(phase)*self.last
+            # quarters 2 and 3 are skipped
+            self.n_snapshots += 1 if quarter == 0 else 3
+            instant = self.snapshotInstant()
+            if quarter == 1 and cycle > 0 and self.compare(cycle):
+                self.instant = i
+                self.level = level.copy()
+                self.values = np.array(self.changes)
+                return True
+        if instant < i + 1:
+            self.last[:] = level
+        return False
+
+    def compare(self, cycle):
+        """
+        Compares the snapshots of `cycle` with the ones of the previous cycle.
+
+        Returns:
+            bool: True if the relative change is below `tol`.
+        """
+        current, previous = self.snapshots[cycle%2], self.snapshots[(cycle - 1)%2]
+        change = sum(np.sum((a - b)**2) for a, b in zip(current, previous))
+        norm = sum(np.sum(a**2) for a in current)
+        self.changes += [np.sqrt(change/norm) if norm > 0 else np.inf]
+        return self.changes[-1] < self.tol
+
+    def stop(self):
+        """
+        Keeps the changes of the last simulation on `values`.
+        """
+        self.values = np.array(self.changes)
+        self.snapshots = self.last = None
@@ -19,6 +19,8 @@ class Source():
 
         self.function = function #: function that describes source behavior
         self.positions = getPositions(self.X_grid, self.Y_grid, self.xcorners, self.ycorners) #: position of the source
+        self.indices = np.flatnonzero(self.positions) #: flat indices of the points of the source
+        self.slots = None #: position of `indices` on the source points of the tank
 
         if amplitude < 0 or amplitude > 1:
             raise(Exception("Amplitude is not valid"))
@@ -26,6 +28,40 @@ class Source():
 
         self.rippletank.addSource(self)
 
+    def sample(self, i):
+        """
+        Receives an int number related with an iterator, evaluates `function` using that number
+        only on the points of the source. `function` can return a single value for all the
+        points, an array with a value per point of `indices`, a 2d array with the values
+        on the whole tank or None.
+
+        Returns:
+            float or np.ndarray: source values on `indices`.
+        """
+        answer = self.function(self, i)
+        if type(answer) == type(None):
+            return 0.0
+        if np.ndim(answer) == 2:
+            answer = answer.reshape(-1)[self.indices]
+        return answer*self.amplitude*self.rippletank.deep
+
+    def table(self, instants):
+        """
+        Evaluates the source on an array of `instants`. Functions with a True `vectorized`
+        attribute receive all the instants at once, as a column array, others are
+        evaluated instant by instant.
+
+        Returns:
+            np.ndarray: 2d array, instants by `indices`.
+        """
+        shape = (len(instants), len(self.indices))
+        if getattr(self.function, 'vectorized', False):
+            answer = self.function(self, np.reshape(instants, (-1, 1)))
+            if type(answer) == type(None):
+                return np.zeros(shape)
+            return np.broadcast_to(answer*self.amplitude*self.rippletank.deep, shape)
+        return np.array([np.broadcast_to(self.sample(i), shape[1:]) for i in instants]).reshape(shape)
+
     def evaluate(self, i):
         """
         Receives an int number related with an iterator, evaluates `function` using that number.
@@ -33,53 +69,123 @@ class Source():
         Returns:
             np.ndarray: source values.
         """
+        answer = np.zeros_like(self.X_grid)
+        answer.reshape(-1)[self.indices] = self.sample(i)
+        return answer
+
+class SourceArray():
+    """
+    SourceArrays are sets of point sources, emitters, with their own positions, frequencies,
+    phases and amplitudes, which are evaluated at once. Every emitter stands on the closest
+    point of the grid to its `x`, `y` coordinates. `function` receives the source array and
+    returns one value per emitter, the built in functions already do so.
+    """
+    def __init__(self, rippletank, function, x, y, freq = 1, phase = 0, amplitude = 0.1):
+        self.rippletank = rippletank #: parent tank
+        self.X_grid = rippletank.X #: x grid coordinates
+        self.Y_grid = rippletank.Y #: y grid coordinates
+
+        x, y, freq, phase, amplitude = np.broadcast_arrays(np.atleast_1d(x), y, freq, phase, amplitude)
+        self.x = np.array(x, dtype = float) #: x coordinates of the emitters
+        self.y = np.array(y, dtype = float) #: y coordinates of the emitters
+        self.freq = np.array(freq, dtype = float) #: frequency of every emitter
+        self.period = 1.0/self.freq.max() #: shortest period of the emitters
+        self.phase = np.array(phase, dtype = float) #: phase of every emitter
+
+        if (amplitude < 0).any() or (amplitude > 1).any():
+            raise(Exception("Amplitude is not valid"))
+        self.amplitude = np.array(amplitude, dtype = float) #: relative amplitude of every emitter
+
+        xdim, ydim = rippletank.xdim, rippletank.ydim
+        if (self.x < min(xdim)).any() or (self.x > max(xdim)).any() or (self.y < min(ydim)).any() or (self.y > max(ydim)).any():
+            raise(Exception("Emitters must be inside the ripple tank."))
+        columns = np.round((self.x - xdim[0])/rippletank.dx).astype(int)
+        rows = np.round((self.y - ydim[0])/rippletank.dy).astype(int)
+        cells = rows*self.X_grid.shape[1] + columns
+
+        self.function = function #: function that describes source behavior
+        self.indices, self.emitter_slots = np.unique(cells, return_inverse = True) #: flat indices of the points of the source and point of every emitter
+        self.positions = np.zeros(self.X_grid.shape, dtype = bool) #: position of the source
+        self.positions.reshape(-1)[self.indices] = True
+        self.slots = None #: position of `indices` on the source points of the tank
+
+        self.rippletank.addSource(self)
+
+    def sample(self, i):
+        """
+        Evaluates all the emitters on the instant `i`, emitters on the same point are added.
+
+        Returns:
+            np.ndarray: source values on `indices`.
+        """
         answer = self.function(self, i)
         if type(answer) == type(None):
-            return np.zeros_like(self.X_grid)
-        return answer*self.amplitude*self.rippletank.deep
+            return 0.0
+        values = answer*self.amplitude*self.rippletank.deep*np.ones(len(self.x))
+        return np.bincount(self.emitter_slots.reshape(-1), weights = values, minlength = len(self.indices))
+
+    def table(self, instants):
+        """
+        Evaluates all the emitters on an array of `instants` (see `Source.table`).
+
+        Returns:
+            np.ndarray: 2d array, instants by `indices`.
+        """
+        table = np.zeros((len(instants), len(self.indices)))
+        if getattr(self.function, 'vectorized', False):
+            answer = self.function(self, np.reshape(instants, (-1, 1)))
+            if type(answer) != type(None):
+                values = answer*self.amplitude*self.rippletank.deep*np.ones((len(instants), len(self.x)))
+                np.add.at(table, (slice(None), self.emitter_slots.reshape(-1)), values)
+            return table
+        for row, i in enumerate(instants):
+            table[row] = self.sample(i)
+        return table
+
+    def evaluate(self, i):
+        """
+        Evaluates all the emitters on the instant `i`.
+
+        Returns:
+            np.ndarray: source values.
+        """
+        answer = np.zeros_like(self.X_grid)
+        answer.reshape(-1)[self.indices] = self.sample(i)
+        return answer
 
 def dropSource(source, i):
     """
-    Pulse function.
+    Pulse function, `i` can be an array of instants.
 
     Returns:
-        np.ndarray: array with -1.0 values on source positions.
+        float: -1.0 on the first instant, None afterwards.
     """
     t = source.rippletank.dt*i
+    if np.ndim(t) != 0:
+        return np.where(t == 0, -1.0, 0.0)
     if t != 0:
         return None
-
-    answer = np.zeros_like(source.X_grid)
-    answer[source.positions] = -1.0
-    return answer
+    return -1.0
 
 def sineSource(source, i):
     """
-    Sine function.
+    Sine function, `i` can be an array of instants.
 
     Returns:
-        np.ndarray: array with sine values on source positions.
+        float: sine value.
     """
     t = source.rippletank.dt*i
-    answer = np.zeros_like(source.X_grid)
-    value = np.sin(2*np.pi*source.freq*t + source.phase)
-    # if value < 0:
-    #     answer[source.positions] = value
-    # else:
-    #     # return None
-
-    answer[source.positions] = value
-    return answer
+    return np.sin(2*np.pi*source.freq*t + source.phase)
 
 def squareSource(source, i):
     """
-    Square function.
+    Square function, `i` can be an array of instants.
 
     Returns:
-        np.ndarray: array with square values on source positions.
+        float: square value, 1.0, 0.0 or -1.0.
     """
-    answer = sineSource(source, i)
-    answer[answer > 0] = 1.0
-    answer[answer < 0] = -1.0
+    return np.sign(sineSource(source, i))
 
-    return answer
+dropSource.vectorized = True
+sineSource.vectorized = True
+squareSource.vectorized = True
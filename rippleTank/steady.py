@@ -0,0 +1,242 @@
+import hashlib
+import numpy as np
+
+from .backends import STENCILS
+from .sources import sineSource
+
+try:
+    import scipy.sparse as sparse
+    import scipy.sparse.linalg as sparse_linalg
+except ImportError:
+    sparse = sparse_linalg = None
+
+__all__ = ['SteadyStateSolver']
+
+def secondDifferences(n_cells, order):
+    """
+    Central second differences along an axis of `n_cells`, with the highest order up to
+    `order` that fits on every cell, as in the stepping backends. Rows of the two ends are empty.
+
+    Returns:
+        scipy.sparse.csr_matrix: n_cells by n_cells matrix.
+    """
+    matrix = sparse.lil_matrix((n_cells, n_cells))
+    for k in range(1, n_cells - 1):
+        half = min(order//2, k, n_cells - 1 - k)
+        coefs = STENCILS[2*half]
+        matrix[k, k] = coefs[0]
+        for m in range(1, half + 1):
+            matrix[k, k - m] = matrix[k, k + m] = coefs[m]
+    return matrix.tocsr()
+
+def centralDifferences(n_cells):
+    """
+    Differences between the two neighbours of every cell along an axis of `n_cells`.
+    Rows of the two ends are empty.
+
+    Returns:
+        scipy.sparse.csr_matrix: n_cells by n_cells matrix.
+    """
+    inner = np.arange(1, n_cells - 1)
+    rows = np.concatenate([inner, inner])
+    columns = np.concatenate([inner + 1, inner - 1])
+    values = np.concatenate([np.ones(len(inner)), -np.ones(len(inner))])
+    return sparse.csr_matrix((values, (rows, columns)), shape = (n_cells, n_cells))
+
+class SteadyStateSolver():
+    """
+    SteadyStateSolvers compute the time harmonic state reached by a linear `RippleTank`
+    whose sources are sines, `sineSource`, of a single frequency: the amplitude at the
+    instant i tends to the imaginary part of `state*exp(2j*pi*freq*dt*i)`.
+
+    Instead of the continuous Helmholtz equation, the operator is the Z transform of the
+    stepping scheme itself, at z = exp(2j*pi*freq*dt): the central differences of the tank
+    `order`, the open boundaries update or the perfectly matched layer with its auxiliary
+    fields, and the dry points. Its interior rows are `(2 - 2cos(2*pi*freq*dt))*U + L*U = 0`,
+    thus the steady state is the limit of `solvePoints` when the transient leaves the tank.
+    Closed tanks do not absorb the transient, which never decays while stepping.
+
+    Sources are fixed values on their points. The sparse LU factorization of the operator
+    without sources is cached, and up to `capacitance_cells` source points are imposed by a
+    capacitance matrix, made with one solve per point, so that only the sources change
+    between solves with the same masks, `dt` and frequency. Larger sources are replaced on
+    the rows of the operator, whose factorization is cached for those source points.
+    Requires scipy.
+    """
+    def __init__(self, rippletank, capacitance_cells = 256):
+        if sparse is None:
+            raise(Exception("The steady state solver requires scipy."))
+        self.rippletank = rippletank #: parent tank
+        self.capacitance_cells = capacitance_cells #: largest number of source points imposed by capacitance
+        self.factorizations = {} #: LU factorizations by operator hash
+        self.capacitances = {} #: capacitance matrices by operator and source points hash
+
+    def operatorKey(self, freq):
+        """
+        Hashes everything the operator depends on.
+
+        Returns:
+            str: hexadecimal hash.
+        """
+        tank = self.rippletank
+        key = hashlib.sha1()
+        key.update(repr((tank.X.shape, tank.dt, tank.dx, tank.dy, tank.g, tank.bc, tank.order,
+                        tank.pml_width, float(freq))).encode())
+        key.update(np.ascontiguousarray(tank.masked_deep*np.ones(tank.X.shape)).tobytes())
+        if tank.pml is not None:
+            key.update(np.ascontiguousarray(tank.pml).tobytes())
+        return key.hexdigest()
+
+    def buildOperator(self, freq):
+        """
+        Assembles the operator of the tank at `freq`, without sources.
+
+        Returns:
+            scipy.sparse.csr_matrix: complex matrix over the flattened points of the tank.
+        """
+        tank = self.rippletank
+        n_rows, n_columns = tank.X.shape
+        z = np.exp(2j*np.pi*freq*tank.dt)
+        speed = np.sqrt(tank.g*np.maximum(tank.masked_deep*np.ones(tank.X.shape), 0))
+        courantx, couranty = speed*tank.dt/tank.dx, speed*tank.dt/tank.dy
+        identity_x, identity_y = sparse.identity(n_columns), sparse.identity(n_rows)
+
+        laplacian = (sparse.diags(courantx.ravel()**2)@sparse.kron(identity_y, secondDifferences(n_columns, tank.order))
+                    + sparse.diags(couranty.ravel()**2)@sparse.kron(secondDifferences(n_rows, tank.order), identity_x))
+        center = z - 2 + 1/z
+        interior = sparse.diags(np.full(speed.size, center)) - laplacian
+        if tank.bc == 'pml':
+            # the auxiliary fields are solved out, psi = gain*D(U)/(1 - decay/z)
+            sigmax, sigmay = [np.asarray(profile, dtype = float) for profile in tank.pml]
+            halfx, halfy = sigmax*tank.dt/2, sigmay*tank.dt/2
+            damping = halfx + halfy
+            mass = tank.dt*tank.dt*sigmax*sigmay
+            gainx = tank.dt**3*speed**2*(sigmay - sigmax)/((1 + halfx)*4*tank.dx*tank.dx)
+            gainy = tank.dt**3*speed**2*(sigmax - sigmay)/((1 + halfy)*4*tank.dy*tank.dy)
+            fieldx = gainx/(1 - (1 - halfx)/((1 + halfx)*z))
+            fieldy = gainy/(1 - (1 - halfy)/((1 + halfy)*z))
+            for field in (fieldx, fieldy):
+                field[[0, -1], :] = field[:, [0, -1]] = 0
+            differencex = sparse.kron(identity_y, centralDifferences(n_columns))
+            differencey = sparse.kron(centralDifferences(n_rows), identity_x)
+            center = damping*z - damping/z + mass
+            interior = (interior + sparse.diags(center.ravel())
+                        - differencex@sparse.diags(fieldx.ravel())@differencex
+                        - differencey@sparse.diags(fieldy.ravel())@differencey)
+
+        kind = np.zeros(tank.X.shape, dtype = int) # 0 interior, 1 open boundary, 2 fixed to zero
+        kind[[0, -1], :] = kind[:, [0, -1]] = 1 if tank.bc == 'open' else 2
+        kind[speed == 0] = 2
+
+        index = np.arange(speed.size).reshape(tank.X.shape)
+        rows, columns, values = [], [], []
+        if tank.bc == 'open':
+            # rows first, then columns, which overwrite the corners
+            for row, inward, courant in ((0, 1, couranty), (-1, -2, couranty)):
+                cells = (row, slice(1, -1))
+                inner = (inward, slice(1, -1))
+                rows += [index[cells]]*2
+                columns += [index[cells], index[inner]]
+                values += [z - 1 + courant[cells], -courant[cells]]
+            for column, inward, courant in ((0, 1, courantx), (-1, -2, courantx)):
+                cells = (slice(None), column)
+                inner = (slice(None), inward)
+                rows += [index[cells]]*2
+                columns += [index[cells], index[inner]]
+                values += [z - 1 + courant[cells], -courant[cells]]
+        boundary = sparse.csr_matrix((np.concatenate(values) if values else np.zeros(0),
+                                    (np.concatenate(rows) if rows else np.zeros(0, dtype = int),
+                                    np.concatenate(columns) if columns else np.zeros(0, dtype = int))),
+                                    shape = interior.shape)
+
+        kind = kind.ravel()
+        return (sparse.diags((kind == 0)*1.0)@interior + sparse.diags((kind == 1)*1.0)@boundary
+                + sparse.diags((kind == 2)*1.0)).tocsr()
+
+    def sourceValues(self, freq):
+        """
+        Gathers the source points and their complex amplitude at `freq`. Points of sines
+        of other frequencies are fixed to zero.
+
+        Raises:
+            Exception: "Only sineSource sources have a steady state."
+
+        Returns:
+            np.ndarray: 1d array with the flat indices of the source points.
+            np.ndarray: 1d complex array with the values on them.
+        """
+        tank = self.rippletank
+        cells = np.flatnonzero(tank.getSourcesPositions())
+        values = np.zeros(len(cells), dtype = complex)
+        for source in tank.sources:
+            if source.function is not sineSource:
+                raise(Exception("Only sineSource sources have a steady state."))
+            phasor = np.isclose(source.freq, freq)*source.amplitude*tank.deep*np.exp(1j*np.asarray(source.phase))
+            slots = np.searchsorted(cells, source.indices)
+            if hasattr(source, 'emitter_slots'):
+                emitters = phasor*np.ones(len(source.x))
+                phasor = np.zeros(len(source.indices), dtype = complex)
+                np.add.at(phasor, source.emitter_slots.reshape(-1), emitters)
+            values[slots] += phasor
+        return cells, values
+
+    def factorize(self, freq, cells = None):
+        """
+        Factorizes the operator at `freq`, with the rows of `cells` fixed if given.
+        Factorizations are cached.
+
+        Returns:
+            scipy.sparse.linalg.SuperLU: factorization.
+        """
+        key = self.operatorKey(freq)
+        if cells is not None:
+            key += hashlib.sha1(np.asarray(cells, dtype = np.int64).tobytes()).hexdigest()
+        if not key in self.factorizations:
+            operator = self.buildOperator(freq)
+            if cells is not None:
+                fixed = np.zeros(operator.shape[0])
+                fixed[cells] = 1
+                operator = sparse.diags(1 - fixed)@operator + sparse.diags(fixed)
+            self.factorizations[key] = sparse_linalg.splu(operator.tocsc())
+        return self.factorizations[key]
+
+    def capacitance(self, freq, cells, chunk = 64):
+        """
+        Capacitance matrix of the `cells` at `freq`, the rows and columns of `cells` of
+        the inverse of the operator. Matrices are cached.
+
+        Returns:
+            np.ndarray: 2d complex array.
+        """
+        key = self.operatorKey(freq) + hashlib.sha1(np.asarray(cells, dtype = np.int64).tobytes()).hexdigest()
+        if not key in self.capacitances:
+            factorization = self.factorize(freq)
+            matrix = np.zeros((len(cells), len(cells)), dtype = complex)
+            for start in range(0, len(cells), chunk):
+                stop = min(start + chunk, len(cells))
+                unit = np.zeros((factorization.shape[0], stop - start), dtype = complex)
+                unit[cells[start:stop], np.arange(stop - start)] = 1
+                matrix[:, start:stop] = factorization.solve(unit)[cells]
+            self.capacitances[key] = matrix
+        return self.capacitances[key]
+
+    def solve(self, freq):
+        """
+        Computes the steady state at `freq`.
+
+        Returns:
+            np.ndarray: 2d complex array, the amplitude at the instant i tends to
+            the imaginary part of `state*exp(2j*pi*freq*dt*i)`.
+        """
+        tank = self.rippletank
+        cells, values = self.sourceValues(freq)
+        forcing = np.zeros(tank.X.size, dtype = complex)
+        if len(cells) == 0:
+            return forcing.reshape(tank.X.shape)
+        if len(cells) <= self.capacitance_cells:
+            forcing[cells] = np.linalg.solve(self.capacitance(freq, cells), values)
+            state = self.factorize(freq).solve(forcing)
+        else:
+            forcing[cells] = values
+            state = self.factorize(freq, cells).solve(forcing)
+        return state.reshape(tank.X.shape)
@@ -0,0 +1,177 @@
+"""
+Frames files store the amplitude of a simulation on disk with the following layout:
+
+1. Header, `HEADER_SIZE` bytes: `MAGIC`, a version byte and a JSON document padded with spaces.
+   The document holds `shape` (frames, n_cells_y, n_cells_x), `dtype`, `dt`, `extent`, `units`,
+   `chunk_frames`, the byte offsets `deep_offset`, `frames_offset` and `instants_offset`,
+   `instants_dtype`, and the minimum and maximum values of the amplitude and of the amplitude + deep.
+2. Deep, a single 2d array with the deep on every point (`masked_deep`).
+3. Frames, the 2d amplitude arrays in C order, written in chunks of `chunk_frames` frames.
+4. Instants, index of the instant of every frame, int64 or float64 for interpolated frames.
+"""
+import json
+import numpy as np
+
+__all__ = ['FrameWriter', 'FrameStore', 'readHeader']
+
+HEADER_SIZE = 4096 #: bytes reserved for the header of a frames file
+MAGIC = b"RIPPLETANK" #: first bytes of a frames file
+VERSION = 1 #: version of the frames file layout
+
+class FrameWriter():
+    """
+    FrameWriters store the frames of a running simulation on disk, keeping in memory
+    only a chunk of `chunk_frames` frames.
+    """
+    def __init__(self, path, rippletank, chunk_frames = 16):
+        self.path = path #: path of the frames file
+        self.rippletank = rippletank #: parent tank
+        self.chunk_frames = chunk_frames #: frames written at once
+        self.dtype = np.dtype(rippletank.dtype) #: data type of the frames
+        self.shape = rippletank.X.shape #: shape of a single frame
+
+        self.buffer = np.zeros((chunk_frames, ) + self.shape, dtype = self.dtype) #: chunk being filled
+        self.n_buffer = 0 #: frames on buffer
+        self.instants = [] #: instants written
+        self.limits = [np.inf, -np.inf, np.inf, -np.inf] #: amplitude and amplitude + deep, min and max
+
+        self.deep = np.asarray(rippletank.masked_deep*np.ones(self.shape), dtype = self.dtype) #: deep on every point
+        self.file = open(path, 'wb')
+        self.file.write(b"\0"*HEADER_SIZE)
+        self.file.write(self.deep.tobytes())
+
+    def append(self, instant, frame):
+        """
+        Adds the amplitude `frame` of the instant `instant` to the file.
+        """
+        self.buffer[self.n_buffer] = frame
+        self.n_buffer += 1
+        self.instants += [instant]
+
+        complete = frame + self.deep
+        self.limits = [min(self.limits[0], frame.min()), max(self.limits[1], frame.max()),
+                        min(self.limits[2], complete.min()), max(self.limits[3], complete.max())]
+        if self.n_buffer == self.chunk_frames:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the frames on buffer to the file.
+        """
+        self.file.write(self.buffer[:self.n_buffer].tobytes())
+        self.n_buffer = 0
+
+    def close(self):
+        """
+        Writes the remaining frames, the instants and the header.
+
+        Returns:
+            FrameStore: read only view of the file.
+        """
+        self.flush()
+        frame_bytes = self.deep.nbytes
+        instants = np.array(self.instants, dtype = np.float64)
+        if np.array_equal(instants, np.round(instants)):
+            instants = instants.astype(np.int64)
+        header = {"shape": [len(self.instants), self.shape[0], self.shape[1]],
+                  "dtype": self.dtype.str,
+                  "dt": float(self.rippletank.dt),
+                  "extent": [float(value) for value in self.rippletank.extent],
+                  "units": self.rippletank.units,
+                  "chunk_frames": self.chunk_frames,
+                  "deep_offset": HEADER_SIZE,
+                  "frames_offset": HEADER_SIZE + frame_bytes,
+                  "instants_offset": HEADER_SIZE + frame_bytes*(len(self.instants) + 1),
+                  "instants_dtype": instants.dtype.str,
+                  "limits": [float(value) for value in self.limits]}
+        self.file.write(instants.tobytes())
+
+        header = MAGIC + bytes([VERSION]) + json.dumps(header).encode('ascii')
+        if len(header) > HEADER_SIZE:
+            raise(Exception("Header does not fit in %d bytes."%HEADER_SIZE))
+        self.file.seek(0)
+        self.file.write(header.ljust(HEADER_SIZE, b" "))
+        self.file.close()
+        return FrameStore(self.path)
+
+def readHeader(path):
+    """
+    Reads the header of a frames file.
+
+    Raises:
+        Exception: "path is not a rippleTank frames file."
+
+    Returns:
+        dict: header values.
+    """
+    with open(path, 'rb') as file:
+        data = file.read(HEADER_SIZE)
+    if data[:len(MAGIC)] != MAGIC:
+        raise(Exception("'%s' is not a rippleTank frames file."%path))
+    if data[len(MAGIC)] != VERSION:
+        raise(Exception("Frames file version %d is not supported."%data[len(MAGIC)]))
+    return json.loads(data[len(MAGIC) + 1:].decode('ascii'))
+
+class FrameStore():
+    """
+    FrameStores are read only views of a frames file, frames are paged in from disk
+    only when they are indexed. When `add_deep` is True frames contain the amplitude + deep,
+    as `RippleTank.complete_values`, otherwise only the amplitude.
+    """
+    def __init__(self, path, add_deep = True):
+        self.path = path #: path of the frames file
+        self.header = readHeader(path) #: header values
+        self.add_deep = add_deep #: if True the deep is added to every frame
+
+        self.shape = tuple(self.header["shape"]) #: frames, n_cells_y, n_cells_x
+        self.dtype = np.dtype(self.header["dtype"]) #: data type of the frames
+        self.dt = self.header["dt"] #: dt value of the simulation
+        self.extent = self.header["extent"] #: matplotlib extent parameter
+        self.ndim = 3 #: number of dimensions
+
+        self.deep = np.memmap(path, dtype = self.dtype, mode = 'r',
+                        offset = self.header["deep_offset"], shape = self.shape[1:]) #: deep on every point
+        if self.shape[0] > 0:
+            self.frames = np.memmap(path, dtype = self.dtype, mode = 'r',
+                        offset = self.header["frames_offset"], shape = self.shape) #: amplitude frames
+            self.instants = np.array(np.memmap(path, dtype = self.header.get("instants_dtype", "<i8"), mode = 'r',
+                        offset = self.header["instants_offset"], shape = self.shape[:1])) #: instant of every frame
+        else:
+            self.frames = np.zeros(self.shape, dtype = self.dtype)
+            self.instants = np.zeros(0, dtype = np.int64)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, index):
+        frame = np.array(self.frames[index])
+        if self.add_deep:
+            frame = frame + self.deep
+        return frame
+
+    def withDeep(self, add_deep = True):
+        """
+        Other view of the same file.
+
+        Returns:
+            FrameStore: view with or without the deep added.
+        """
+        return FrameStore(self.path, add_deep)
+
+    def min(self):
+        """
+        Minimum value of all the frames, stored on the header.
+
+        Returns:
+            float: minimum value.
+        """
+        return self.header["limits"][2 if self.add_deep else 0]
+
+    def max(self):
+        """
+        Maximum value of all the frames, stored on the header.
+
+        Returns:
+            float: maximum value.
+        """
+        return self.header["limits"][3 if self.add_deep else 1]
@@ -0,0 +1,201 @@
+import os
+import pickle
+import hashlib
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from .probes import Probe
+
+__all__ = ['sweep', 'parameterGrid', 'maxAmplitude', 'probeSeries', 'probeValues']
+
+def parameterGrid(param_grid):
+    """
+    Expands a dictionary of parameter names and lists of values into all its combinations.
+    A list of dictionaries is returned as it is.
+
+    Returns:
+        list: dictionaries with one value per parameter.
+    """
+    if isinstance(param_grid, dict):
+        names = sorted(param_grid.keys())
+        values = [param_grid[name] for name in names]
+        return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+    return [dict(params) for params in param_grid]
+
+def valueKey(value):
+    """
+    Identifies a value by its repr, or by the dtype, shape and bytes of arrays, whose
+    repr is abbreviated when they are large. Lists, tuples and dicts are identified
+    item by item.
+
+    Returns:
+        str: value identifier.
+    """
+    if isinstance(value, np.ndarray):
+        value = np.ascontiguousarray(value)
+        return "array(%s, %r, %s)"%(value.dtype.str, value.shape, hashlib.sha1(value.tobytes()).hexdigest())
+    if isinstance(value, (list, tuple)):
+        return "%s(%s)"%(type(value).__name__, ", ".join(valueKey(item) for item in value))
+    if isinstance(value, dict):
+        return "{%s}"%", ".join("%r: %s"%(name, valueKey(value[name])) for name in sorted(value, key = repr))
+    return repr(value)
+
+def functionKey(function):
+    """
+    Identifies a function by its module, name, code and bound arguments.
+
+    Returns:
+        str: function identifier.
+    """
+    if hasattr(function, 'func'):
+        return "%s%s%s"%(functionKey(function.func), valueKey(function.args), valueKey(function.keywords))
+    key = "%s.%s"%(getattr(function, '__module__', ''), getattr(function, '__name__', repr(function)))
+    code = getattr(function, '__code__', None)
+    if code is not None:
+        key += "%r%r"%(code.co_code, code.co_consts)
+    return key
+
+def probeKey(probe):
+    """
+    Identifies a probe (see `rippleTank.probes`) by its class and the parameters that
+    change its records: points, `every`, shape and `reduce` of probes, instants of field
+    statistics, and tolerance and period of steady state monitors.
+
+    Returns:
+        str: probe identifier.
+    """
+    key = type(probe).__name__
+    if hasattr(probe, 'cells'):
+        key += valueKey((probe.cells, probe.every, probe.shape))
+        if getattr(probe, 'reduce', None) is not None:
+            key += functionKey(probe.reduce)
+    elif hasattr(probe, 'start_instant'):
+        key += valueKey((probe.start_instant, probe.stop_instant))
+    elif hasattr(probe, 'tol'):
+        key += valueKey((probe.tol, probe.period))
+    return key
+
+def tankKey(rippletank, *extra):
+    """
+    Hashes the grid, deep, masks, boundary conditions, sources and probes of `rippletank`,
+    together with any `extra` value.
+
+    Returns:
+        str: hexadecimal hash.
+    """
+    tank = rippletank
+    key = hashlib.sha1()
+    key.update(repr((tank.xdim, tank.ydim, tank.X.shape, float(tank.dt), tank.bc, tank.pml_width, tank.g, tank.linear, tank.order, tank.dtype.str)).encode())
+    key.update(np.ascontiguousarray(tank.masked_deep*np.ones(tank.X.shape)).tobytes())
+    if tank.lts_levels > 1:
+        key.update(repr(('lts_levels', tank.lts_levels)).encode())
+    for source in tank.sources:
+        key.update(functionKey(source.function).encode())
+        key.update(valueKey((source.freq, source.phase, source.amplitude)).encode())
+        key.update(np.packbits(source.positions).tobytes())
+    for probe in tank.probes:
+        key.update(probeKey(probe).encode())
+    for value in extra:
+        key.update(valueKey(value).encode())
+    return key.hexdigest()
+
+def maxAmplitude(rippletank, levels):
+    """
+    Reducer with the maximum absolute amplitude reached on every point.
+
+    Returns:
+        np.ndarray: 2d array.
+    """
+    envelope = np.zeros_like(rippletank.X)
+    for i, level in levels:
+        np.maximum(envelope, np.abs(level), out = envelope)
+    return envelope
+
+def probeSeries(rippletank, levels, points = ()):
+    """
+    Reducer with the amplitude on the grid points closest to the (x, y) `points`.
+    Use `functools.partial` to set the `points` of a sweep.
+
+    Returns:
+        np.ndarray: 2d array, first dimension represents time.
+    """
+    x, y = np.array(points, dtype = float).reshape(-1, 2).T
+    probe = Probe(rippletank, x, y)
+    for i, level in levels:
+        pass
+    return probe.values.reshape(-1, len(x))
+
+def probeValues(rippletank, levels):
+    """
+    Reducer with the records of the probes added to the tank by `build_tank`
+    (see `rippleTank.probes`), no frame is stored.
+
+    Returns:
+        list: `values` of every probe.
+    """
+    for i, level in levels:
+        pass
+    return [probe.values for probe in rippletank.probes]
+
+def runJob(build_tank, params, sim_duration, n_instants, reduce, cache_dir):
+    """
+    Builds a tank with `params`, simulates it streaming its levels to `reduce`,
+    and stores the result on `cache_dir`. Cached results are not computed again.
+
+    Returns:
+        object: result of `reduce`.
+    """
+    tank = build_tank(**params)
+    if n_instants is None:
+        n_instants = int(round(sim_duration/tank.dt))
+
+    path = None
+    if cache_dir is not None:
+        key = tankKey(tank, n_instants, functionKey(reduce))
+        path = os.path.join(cache_dir, key + '.pkl')
+        if os.path.exists(path):
+            with open(path, 'rb') as file:
+                return pickle.load(file)
+
+    result = reduce(tank, tank.iterLevels(n_instants))
+    if path is not None:
+        temp = path + '.%d.tmp'%os.getpid()
+        with open(temp, 'wb') as file:
+            pickle.dump(result, file)
+        os.replace(temp, path)
+    return result
+
+def sweep(build_tank, param_grid, sim_duration = None, n_instants = None, reduce = maxAmplitude,
+            n_workers = None, cache_dir = None):
+    """
+    Runs a parameter sweep: for every combination of `param_grid` (see `parameterGrid`)
+    a tank is made with `build_tank(**params)` and simulated during `sim_duration` seconds
+    or `n_instants`. Only the output of `reduce(tank, levels)`, which receives the
+    `RippleTank.iterLevels` generator, is kept. Jobs run on `n_workers` processes, thus
+    `build_tank` and `reduce` must be module level functions.
+
+    If `cache_dir` is given, results are stored there under a hash of the tank, the masks,
+    the sources, the probes, the duration and the reducer, so interrupted or extended sweeps only
+    compute the missing jobs.
+
+    Raises:
+        Exception: "Either sim_duration or n_instants is required."
+
+    Returns:
+        list: (params, result) tuples, in the order of the parameter grid.
+    """
+    if sim_duration is None and n_instants is None:
+        raise(Exception("Either sim_duration or n_instants is required."))
+    if cache_dir is not None and not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+
+    grid = parameterGrid(param_grid)
+    jobs = [(build_tank, params, sim_duration, n_instants, reduce, cache_dir) for params in grid]
+    if n_workers == 1:
+        results = [runJob(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers = n_workers) as pool:
+            futures = [pool.submit(runJob, *job) for job in jobs]
+            results = [future.result() for future in futures]
+    return list(zip(grid, results))
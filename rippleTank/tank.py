@@ -1,9 +1,22 @@
+import os
+import json
+import hashlib
+import warnings
 import numpy as np
 from matplotlib.cm import jet
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 
 from .masks import *
+from .probes import Probe, FieldStatistics, SteadyStateMonitor
+from .storage import FrameWriter, FrameStore
+from .backends import getBackend, STENCILS, CFL_LIMITS
+from .distributed import DistributedSolver
+from .steady import SteadyStateSolver
+from .multirate import LocalTimeStepper
+
+# the numpy and matplotlib names are exported as they always were, for `from rippleTank import *` scripts
+__all__ = ['RippleTank', 'np', 'jet', 'plt', 'FuncAnimation']
 
 class RippleTank():
     """
@@ -12,20 +25,39 @@ class RippleTank():
     """
     def __init__(self, xdim = (-15, 15), ydim = (-15, 15), deep = 1.0,
                 n_cells_x = 100, n_cells_y = 100, mask = 1.0,
-                bc = 'open', alpha = 0.45, units = 'cm'):
-        posible_bcs = 'open', 'close'
+                bc = 'open', alpha = 0.45, units = 'cm', backend = 'numpy', n_threads = 1,
+                n_processes = 1, precompute_sources = False, linear = True, auto_dt = False,
+                order = 2, pml_width = 10, dtype = np.float64, active_region = True, lts_levels = 1):
+        posible_bcs = 'open', 'close', 'pml'
         if not bc in posible_bcs:
             raise(Exception("'%s' is not a valid boundary condition."%bc))
+        if bc == 'pml' and (pml_width < 1 or 2*(pml_width + 1) >= min(n_cells_x, n_cells_y)):
+            raise(Exception("pml_width must be positive and smaller than half the tank."))
+
+        if not order in STENCILS:
+            raise(Exception("'%s' is not a valid stencil order."%order))
+        if alpha > CFL_LIMITS[order]:
+            raise(Exception("alpha must not exceed %.3f with order %d stencils."%(CFL_LIMITS[order], order)))
+        if int(lts_levels) != lts_levels or lts_levels < 1:
+            raise(Exception("lts_levels must be a positive int."))
+        if lts_levels > 1 and (not linear or bc == 'pml' or n_processes > 1):
+            raise(Exception("Local time stepping requires linear tanks without 'pml' boundaries and n_processes = 1."))
 
         posible_units = 'cm', 'm'
         if not units in posible_units:
             raise(Exception("'%s' are not a valid units."%units))
 
+        self.dtype = np.dtype(dtype) #: floating point type of the simulation arrays, float32 or float64
+        if not self.dtype in (np.float32, np.float64):
+            raise(Exception("dtype must be float32 or float64."))
+
         x = np.linspace(xdim[0], xdim[1], n_cells_x)
         y = np.linspace(ydim[0], ydim[1], n_cells_y)
-        self.dx = x[1] - x[0]
-        self.dy = y[1] - y[0]
+        # scalars are python floats, so they keep the precision of the grids
+        self.dx = float(x[1] - x[0])
+        self.dy = float(y[1] - y[0])
 
+        # coordinates are always float64, so that sources and masks do not depend on `dtype`
         self.X, self.Y = np.meshgrid(x, y) #: two 2d arrays describing the coordinates of the tank
 
         self.xdim = xdim #: x dimensions of the grid
@@ -34,7 +66,13 @@ class RippleTank():
         self.n_cells_x = n_cells_x #: number of cells on x
         self.n_cells_y = n_cells_y #: number of cells on y
         self.units = units #: units used
-        self.bc = bc #: boundary conditions, 'open' or 'close'
+        self.bc = bc #: boundary conditions, 'open', 'close' or 'pml'
+        self.pml_width = pml_width #: cells of the perfectly matched layer when `bc` is 'pml'
+        self.backend = getBackend(backend) #: backend used for stepping, see `rippleTank.backends`
+        self.n_threads = n_threads #: number of threads used for stepping, each one solves a band of rows
+        self.n_processes = n_processes #: number of processes used for stepping, see `rippleTank.distributed`
+        self.order = order #: order of the central differences, 2, 4 or 6, see `rippleTank.backends.STENCILS`
+        self.linear = linear #: if True the propagation speed depends only on the deep, otherwise also on the wave height, and `alpha*sqrt(1 + height/deep)` must stay below the limit of `order`, see `rippleTank.backends`
 
         self.mask = mask #: mask appplied to the tank
         if self.mask == 1:
@@ -43,25 +81,57 @@ class RippleTank():
         self.deep = deep #: deep of the tank, must be positive
         if self.deep < 0:
             raise(Exception('deep value must be positive.'))
-        self.masked_deep = deep*self.mask #: deep on every point
+        self.masked_deep = np.asarray(deep*self.mask, dtype = self.dtype) #: deep on every point
 
         self.g = 9.8 #: gravity value
         if self.units == 'cm':
             self.g = 980
         self.speed = np.sqrt(self.g*deep) #: speed of propagation on each point
 
-        self.dt = alpha*min(self.dx, self.dy)/self.speed #: dt value
+        self.alpha = alpha #: Courant number used to choose `dt`
+        self.lts_levels = int(lts_levels) #: levels of the local time stepping, `dt` is `2**(lts_levels - 1)` times the stable one, see `rippleTank.multirate`
+        self.auto_dt = auto_dt #: if True `dt` is chosen by `planTimeStep` instead of sources and fps
+        self.plan = None #: last `planTimeStep` report used by `simulateTime`
+        self.dt = float(2**(self.lts_levels - 1)*alpha*min(self.dx, self.dy)/self.speed) #: dt value
 
         self.ratiox = (self.speed*self.dt/self.dx)**2 #: finite differences quotient on x
         self.ratioy = (self.speed*self.dt/self.dy)**2 #: finite differences quotient on y
+        self.pml = self.calcPml() #: damping profiles on x and y of the perfectly matched layer
+        self.pml_coefs = None #: coefficients of the perfectly matched layer update
+        self.pml_fields = None #: auxiliary fields of the perfectly matched layer
 
         self.fig = None #: matplotlib figure
         self.ax = None #: matplotlib axes
         self.sources = [] #: stores sources
         self.masks = [] #: stores masks
+        self.probes = [] #: stores probes, see `rippleTank.probes`
         self.amplitude = None #: wave amplitude values
         self.complete_values = None #: wave amplitude + deep
         self.forbidden_pos = None #: positions where sources stand
+        self.source_cells = None #: flat indices where sources stand
+        self.source_values = None #: values of the sources on `source_cells`
+        self.precompute_sources = precompute_sources #: if True sources are read from precomputed tables
+        self.source_chunk = 4096 #: instants on every precomputed table
+        self.source_tables = {} #: precomputed tables of the sources by chunk, see `sourceTable`
+        self.source_tables_kept = 2 #: precomputed tables kept in memory
+        self.source_tables_key = None #: `dt`, `source_chunk` and `sourcesKey` of the precomputed tables
+        self.levels = None #: three time levels used by the finite differences scheme
+        self.step = None #: instant held by `levels[1]`, the one a checkpoint resumes from
+        self.checkpoint_path = None #: file written by the periodic checkpoints, see `setCheckpoints`
+        self.checkpoint_every = None #: instants between periodic checkpoints
+        self.checkpoint_state = None #: checkpoint loaded by `loadCheckpoint`, resumed by the next simulation
+        self.recorded = None #: instants stored on `amplitude`
+        self.courantx = None #: speed*dt/dx on each point
+        self.couranty = None #: speed*dt/dy on each point
+        self.dry = None #: points where speed is zero
+        self.laplacian = None #: central differences buffer
+        self.work = None #: work buffers of every band of rows used while stepping
+        self.prepared = None #: masked_deep, dt, n_threads and backend of the last `prepareStepping`
+        self.active_region = active_region #: if True only the cells the waves may have reached are stepped
+        self.active = None #: (top, bottom, left, right) box of cells stepped on the current instant, None for all
+        self.stepper = None #: `LocalTimeStepper` of the running simulation when `lts_levels` is larger than one
+        self.steady_solver = None #: solver of `solveSteadyState`, keeps its factorizations
+        self.steady_monitor = None #: `SteadyStateMonitor` of the last simulation with `steady_tol`
 
         self.sim_duration = None #: time to simulate
         self.animation_speed = 1.0 #: relative reproduction speed
@@ -69,48 +139,90 @@ class RippleTank():
 
         self.extent = [self.xdim[0], self.xdim[1], self.ydim[0], self.ydim[1]] #: matplotlib extent parameter
 
-    def calcSpeed(self, values):
+    def calcPml(self, reflection = 1e-3):
         """
-        Calculates the propagation speed depending on the actual height of the wave.
-        """
-        deep = values + self.masked_deep
-        speed = np.sqrt(self.g*deep)
-        self.speed = speed
-        # self.speed = np.sqrt(self.g*values)
+        Damping profiles of the perfectly matched layer used when `bc` is 'pml', which
+        absorbs outgoing waves at all angles and frequencies. Profiles grow quadratically
+        from zero, `pml_width` cells away from each boundary, to the value that reduces
+        the amplitude of a wave crossing the layer twice to about `reflection`. The
+        boundaries behind the layer are closed.
 
-    def solveBorders(self, i):
+        Returns:
+            tuple: two 2d arrays, damping along x and along y, None if `bc` is not 'pml'.
         """
-        Determins the state i+1 of the boundaries using the state i.
+        if self.bc != 'pml':
+            return None
+        width = self.pml_width
+        speed = np.sqrt(self.g*np.max(self.masked_deep))
+        profiles = []
+        for n_cells, step in ((self.n_cells_x, self.dx), (self.n_cells_y, self.dy)):
+            distance = np.minimum(np.arange(n_cells), n_cells - 1 - np.arange(n_cells))
+            peak = 3*speed*np.log(1/reflection)/(2*width*step)
+            profiles += [peak*np.clip((width - distance)/float(width), 0, 1)**2]
+        return [(profile*np.ones_like(self.X)).astype(self.dtype) for profile in (profiles[0][None, :], profiles[1][:, None])]
+
+    def prepareStepping(self):
         """
-        ratiox = self.speed*self.dt/self.dx
-        ratioy = self.speed*self.dt/self.dy
-        self.amplitude[i+1, 0] = ratioy[0]*(self.amplitude[i, 1] - self.amplitude[i, 0]) + self.amplitude[i, 0]
-        self.amplitude[i+1, -1] = -ratioy[-1]*(self.amplitude[i, -1] - self.amplitude[i, -2]) + self.amplitude[i, -1]
+        Allocates the arrays used while stepping: propagation speed, finite differences
+        quotients, dry points and work buffers. Stepping then writes on them in place
+        and does not allocate memory on every instant. On linear tanks they are kept
+        until the masks, `dt` or the stepping options change.
+        """
+        key = (self.masked_deep, self.dt, self.n_threads, self.backend)
+        prepared = self.prepared
+        if self.linear and prepared is not None and prepared[0] is key[0] and prepared[1:] == key[1:]:
+            return
+        self.backend.prepare(self)
+        self.calcSpeed(0)
+        self.prepared = key
 
-        self.amplitude[i+1, :, 0] = ratiox[:, 0]*(self.amplitude[i, :, 1] - self.amplitude[i, :, 0]) + self.amplitude[i, :, 0]
-        self.amplitude[i+1, :, -1] = -ratioy[:, -1]*(self.amplitude[i, :, -1] - self.amplitude[i, :, -2]) + self.amplitude[i, :, -1]
+    def calcSpeed(self, values):
+        """
+        Calculates the propagation speed depending on the actual height of the wave,
+        as well as the finite differences quotients and the dry points.
+        """
+        if self.work is None:
+            self.prepareStepping()
+        self.prepared = None
+        self.backend.calcSpeed(self, values)
 
-    def solveInstant(self, i):
+    def solveBorders(self, current, following):
         """
-        Solve the differential equation for a single instant of time, from i to i+1.
+        Determins the state of the boundaries on `following` using the state `current`.
         """
-        self.calcSpeed(self.amplitude[i+1])
-        self.amplitude[i+1, 1:-1, 1:-1] = 2*self.amplitude[i, 1:-1, 1:-1] - self.amplitude[i-1, 1:-1, 1:-1]\
-                                    + self.getSecondPartEquation(i)[1:-1, 1:-1]
-        if self.bc == 'open':
-            self.solveBorders(i)
+        self.backend.solveBorders(self, current, following)
 
-        pos = self.speed == 0
-        self.amplitude[i+1, pos] = 0
+    def solveInstant(self, previous, current, following):
+        """
+        Solve the differential equation for a single instant of time, writes on `following`
+        the state after `current`, which in turn comes after `previous`.
+        """
+        if self.stepper is not None:
+            self.stepper.solveInstant(previous, current, following)
+        else:
+            self.backend.solveInstant(self, previous, current, following)
 
     def addSource(self, source):
         """
         Includes a source to the ripple tank.
         """
         self.sources += [source]
-        if source.period < self.dt:
+        if source.period < self.dt and not self.auto_dt:
             self.setdt(0.1*source.period)
 
+    def addProbe(self, x, y = None):
+        """
+        Includes a probe to the ripple tank. `x` is either a probe (see `rippleTank.probes`)
+        or the x coordinate of a new point `Probe` on `x`, `y`.
+
+        Returns:
+            Probe: included probe.
+        """
+        if y is not None:
+            return Probe(self, x, y)
+        self.probes += [x]
+        return x
+
     def evaluateSources(self, i):
         """
         Evaluates all sources in the tank.
@@ -125,14 +237,67 @@ class RippleTank():
             initial = initial + source.evaluate(i)
         return initial
 
-    def applySources(self, i):
+    def prepareSources(self):
         """
-        Sets the sources values in the amplitude array of the waves.
+        Gathers the points of all the sources, `source_cells`, and the position of the
+        points of every source on it, so that sources are applied only on their points.
+        Precomputed tables are dropped if the sources, `dt` or `source_chunk` changed.
         """
-        values = self.evaluateSources(i)
-        positions = self.forbidden_pos
-        self.amplitude[i, positions] = values[positions] #+ self.masked_deep[positions] #self.deep
-        # print(self.amplitude[i, positions])
+        if self.precompute_sources:
+            key = (self.dt, self.source_chunk, self.sourcesKey())
+            if key != self.source_tables_key:
+                self.source_tables = {}
+                self.source_tables_key = key
+        self.forbidden_pos = self.getSourcesPositions()
+        self.source_cells = np.flatnonzero(self.forbidden_pos)
+        self.source_values = np.zeros(len(self.source_cells), dtype = self.dtype)
+        for source in self.sources:
+            source.slots = np.searchsorted(self.source_cells, source.indices)
+
+    def sampleSources(self, i):
+        """
+        Evaluates all sources in the tank only on their points.
+
+        Returns:
+            np.ndarray: 1d array with the values of the sources on `source_cells` at the i instant.
+        """
+        values = self.source_values
+        values.fill(0)
+        for source in self.sources:
+            values[source.slots] += source.sample(i)
+        return values
+
+    def sourceTable(self, chunk):
+        """
+        Evaluates all sources on the `chunk`-th block of `source_chunk` instants, vectorized
+        over time when the source functions allow it (see `Source.table`). The last
+        `source_tables_kept` tables are kept, and reused by later simulations while the
+        sources and `dt` are the same, see `prepareSources`.
+
+        Returns:
+            np.ndarray: 2d array, instants by `source_cells`.
+        """
+        table = self.source_tables.pop(chunk, None)
+        if table is None:
+            instants = np.arange(chunk*self.source_chunk, (chunk + 1)*self.source_chunk)
+            table = np.zeros((len(instants), len(self.source_cells)), dtype = self.dtype)
+            for source in self.sources:
+                table[:, source.slots] += source.table(instants)
+        # dicts keep the insertion order, the first table is the least recently used
+        self.source_tables[chunk] = table
+        while len(self.source_tables) > self.source_tables_kept:
+            del self.source_tables[next(iter(self.source_tables))]
+        return table
+
+    def applySources(self, i, level):
+        """
+        Sets the sources values of the instant `i` in the amplitude array `level`.
+        """
+        if self.precompute_sources:
+            values = self.sourceTable(i//self.source_chunk)[i%self.source_chunk]
+        else:
+            values = self.sampleSources(i)
+        np.put(level, self.source_cells, values)
 
     def getSourcesPositions(self):
         """
@@ -152,35 +317,84 @@ class RippleTank():
         """
         Sets the delta t value.
         """
-        self.dt = dt
+        self.dt = float(dt)
         self.ratiox = (self.speed*self.dt/self.dx)**2
         self.ratioy = (self.speed*self.dt/self.dy)**2
 
-    def getSecondPartEquation(self, i):
+    def getSecondPartEquation(self, current, out = None):
         """
-        Evaluates the central differences on x and y for the instant i+1.
+        Evaluates the central differences on x and y of the amplitude array `current`,
+        using the quotients of the last `calcSpeed` call. Only the interior of `out`
+        is written.
 
         Returns:
-            np.ndarray: 2d amplitude values at the instant i+1.
+            np.ndarray: 2d contribution of the differences to the following instant.
         """
-        temp = np.zeros_like(self.X)
-        ratiox = (self.speed*self.dt/self.dx)**2
-        ratioy = (self.speed*self.dt/self.dy)**2
+        if self.work is None:
+            self.prepareStepping()
+        if out is None:
+            out = np.zeros_like(self.X, dtype = self.dtype)
+        self.backend.secondPart(self, current, out)
+        return out
+
+    def stableTimeStep(self):
+        """
+        Largest stable `dt` for the current masks, from the maximum propagation speed
+        over `masked_deep` and the Courant number `alpha`, times `2**(lts_levels - 1)`
+        with local time stepping.
 
-        if isinstance(self.speed, np.ndarray):
-            ratiox = ratiox[1:-1, 1:-1]
-            ratioy = ratioy[1:-1, 1:-1]
-        # if (ratiox > 0.25).any() or (ratioy > 0.25).any():
-        #     raise(Exception('Information transmitted faster than expected, please change alpha.'))
-        temp[1:-1, 1:-1] = ratiox*(self.amplitude[i, 1:-1, :-2] - 2*self.amplitude[i, 1:-1, 1:-1] + self.amplitude[i, 1:-1, 2:])\
-                    + ratioy*(self.amplitude[i, :-2, 1:-1] - 2*self.amplitude[i, 1:-1, 1:-1] + self.amplitude[i, 2:, 1:-1])
+        Returns:
+            float: dt value.
+        """
+        speed = np.sqrt(self.g*np.max(self.masked_deep))
+        if speed == 0:
+            return self.dt
+        return 2**(self.lts_levels - 1)*self.alpha*min(self.dx, self.dy)/speed
 
-        return temp
+    def planTimeStep(self, sim_duration, animation_speed=1.0, fps=24.0):
+        """
+        Plans the simulation of `sim_duration` seconds with the stable `dt` (see
+        `stableTimeStep`). Sources are evaluated on the instants of that `dt`, and the
+        frames of an animation with `fps` and `animation_speed` are interpolated
+        between instants, so neither shrinks `dt`. The plan is compared with the `dt` that
+        sources and fps would impose otherwise. The tank is not modified.
 
-    def simulateTime(self, sim_duration, animation_speed=1.0, fps=24.0):
+        Returns:
+            dict: `dt`, `n_instants`, `frame_dt`, `frames`, `record` (fractional instants
+            of the frames), and `legacy_dt`, `legacy_instants` and `saved_steps`.
+        """
+        dt = self.stableTimeStep()
+        frames = int(round(fps*sim_duration/animation_speed))
+        frame_dt = sim_duration/frames
+        record = np.arange(frames)*frame_dt/dt
+        n_instants = max(int(np.ceil(record[-1])) + 1, 2)
+
+        legacy_dt = dt
+        for source in self.sources:
+            if source.period < legacy_dt:
+                legacy_dt = 0.1*source.period
+        legacy_dt = min(legacy_dt, frame_dt)
+        legacy_instants = int(round(sim_duration/legacy_dt))
+
+        for source in self.sources:
+            if source.period < 2*dt:
+                warnings.warn("A source period of %g s is shorter than two steps of %g s."%(source.period, dt))
+
+        return {"dt": dt, "n_instants": n_instants, "frame_dt": frame_dt, "frames": frames,
+                "record": record, "legacy_dt": legacy_dt, "legacy_instants": legacy_instants,
+                "saved_steps": legacy_instants - n_instants}
+
+    def simulateTime(self, sim_duration, animation_speed=1.0, fps=24.0, decimate=True, storage=None, steady_tol=None):
         """
         Simulates an interval of time, if the animation_speed with the current fps value
-        does not match the sim_duration, modifies the `dt` value.
+        does not match the sim_duration, modifies the `dt` value. When `decimate` is True
+        only the frames required by an animation with `fps` and `animation_speed` are stored,
+        while the integration still uses `dt`. Frames are written on disk if `storage` is
+        a path (see `solvePoints`). If `steady_tol` is given the simulation stops once
+        the periodic steady state is reached (see `solvePoints`).
+
+        When `auto_dt` is True, `dt` is planned by `planTimeStep` instead, the plan is kept
+        on `plan` and frames are interpolated at the fps rate.
 
         Returns:
             np.ndarray: 3d array, extra dimension represents time.
@@ -189,35 +403,506 @@ class RippleTank():
         self.animation_speed = animation_speed
         self.fps = fps
 
+        if self.auto_dt:
+            self.plan = self.planTimeStep(sim_duration, animation_speed, fps)
+            if self.plan["dt"] != self.dt:
+                self.setdt(self.plan["dt"])
+            return self.solvePoints(self.plan["n_instants"], self.plan["record"], storage, steady_tol)
+
         frames = round(fps*sim_duration/animation_speed)
         required_dt = sim_duration/frames
         if required_dt < self.dt:
             self.setdt(required_dt)
 
-        points = round(self.sim_duration/self.dt)
-        return self.solvePoints(int(points))
+        points = int(round(self.sim_duration/self.dt))
+        record = 1
+        if decimate:
+            record = np.round(np.arange(frames)*required_dt/self.dt).astype(int)
+        return self.solvePoints(points, record, storage, steady_tol)
 
-    def solvePoints(self, n_instants):
+    def recordingPolicy(self, n_instants, record = 1):
         """
-        Simulates `n_instants` of time.
+        Builds the recording policy `record` over `n_instants`. `record` can be
+        an int, in which case every `record`-th instant is stored, a sequence with the
+        instants to store, a function receiving the instant index and returning True
+        when it has to be stored, or None to store only the last instant. Fractional
+        instants on a sequence are interpolated between the neighbour instants
+        (see `iterRecorded`).
+
+        Raises:
+            Exception: "record must be a positive int, a sequence, a function or None."
 
         Returns:
-            np.ndarray: 3d array, extra dimension represents time.
+            function: receives an instant index, returns True if it is recorded.
         """
-        # self.amplitude = np.ones((n_instants, self.n_cells_y, self.n_cells_x)) * self.masked_deep
-        self.amplitude = np.zeros((n_instants, self.n_cells_y, self.n_cells_x))
-        self.amplitude[0] = self.evaluateSources(0)# + self.masked_deep
-        self.amplitude[1] = self.amplitude[0] + self.getSecondPartEquation(1)# + self.masked_deep
-        self.forbidden_pos = self.getSourcesPositions()
+        if record is None:
+            return lambda i: i == n_instants - 1
+        if callable(record):
+            return record
+        if np.ndim(record) == 1:
+            instants = set(np.asarray(record, dtype=int))
+            return lambda i: i in instants
+        if int(record) != record or record < 1:
+            raise(Exception("record must be a positive int, a sequence, a function or None."))
+        record = int(record)
+        return lambda i: i % record == 0
+
+    def recordedInstants(self, n_instants, record = 1):
+        """
+        Evaluates the recording policy `record` over `n_instants` (see `recordingPolicy`).
+        Instants before a loaded checkpoint are not simulated again and are left out.
+
+        Returns:
+            np.ndarray: 1d array with the stored instants.
+        """
+        recorded = self.recordingPolicy(n_instants, record)
+        if record is None:
+            return np.array([n_instants - 1])[:int(n_instants - 1 >= self.firstInstant())]
+        if np.ndim(record) == 1:
+            record = np.unique(np.asarray(record, dtype=float))
+            record = record[(record >= self.firstInstant()) & (record <= n_instants - 1)]
+            if np.array_equal(record, np.round(record)):
+                record = record.astype(int)
+            return record
+        if callable(record):
+            return np.array([i for i in range(self.firstInstant(), n_instants) if recorded(i)], dtype=int)
+        instants = np.arange(0, n_instants, int(record))
+        return instants[instants >= self.firstInstant()]
+
+    def sourcesKey(self):
+        """
+        Hashes the functions, parameters and points of the sources, used to check that
+        a checkpoint is resumed with the same sources it was saved with.
+
+        Returns:
+            str: hexadecimal hash.
+        """
+        key = hashlib.sha1()
+        for source in self.sources:
+            function = source.function
+            key.update(("%s.%s"%(getattr(function, '__module__', ''), getattr(function, '__name__', repr(function)))).encode())
+            key.update(repr((np.asarray(source.freq).tolist(), np.asarray(source.phase).tolist(),
+                            np.asarray(source.amplitude).tolist())).encode())
+            key.update(np.asarray(source.indices, dtype = np.int64).tobytes())
+        return key.hexdigest()
+
+    def firstInstant(self):
+        """
+        Returns:
+            int: first instant of the next simulation, the step of a loaded checkpoint or 0.
+        """
+        if self.checkpoint_state is None:
+            return 0
+        return self.checkpoint_state['step']
+
+    def setCheckpoints(self, path, every):
+        """
+        Makes the following simulations save a checkpoint on `path` every `every` instants
+        (see `saveCheckpoint`). Use None as `path` to stop saving them.
+
+        Raises:
+            Exception: "every must be a positive int."
+        """
+        if path is not None and (int(every) != every or every < 1):
+            raise(Exception("every must be a positive int."))
+        self.checkpoint_path = path
+        self.checkpoint_every = every
+
+    def autoCheckpoint(self):
+        """
+        Saves a checkpoint if the current step is due to, see `setCheckpoints`.
+        """
+        if self.checkpoint_path is not None and self.step % self.checkpoint_every == 0:
+            self.saveCheckpoint(self.checkpoint_path)
 
-        for i in range(1, n_instants-1):
-            self.solveInstant(i)
-            self.applySources(i)
-            self.applySources(i+1)
+    def saveCheckpoint(self, path):
+        """
+        Saves the state of the simulation on `path`, a numpy `.npz` file: the two time
+        levels of `step` and `step - 1`, the auxiliary fields of the perfectly matched layer,
+        `dt`, the mask composite and a hash of the sources. The file is replaced atomically,
+        thus an interrupted save leaves the previous checkpoint untouched.
+
+        Raises:
+            Exception: "There is no simulation to checkpoint."
+            Exception: "Checkpoints of 'pml' tanks require n_processes = 1."
+        """
+        if self.levels is None or self.step is None:
+            raise(Exception("There is no simulation to checkpoint."))
+        if self.bc == 'pml' and self.n_processes > 1:
+            raise(Exception("Checkpoints of 'pml' tanks require n_processes = 1."))
+
+        arrays = {'previous': self.levels[0], 'current': self.levels[1],
+                  'mask': np.asarray(self.mask), 'masked_deep': self.masked_deep}
+        if self.pml_fields is not None:
+            arrays['pml_x'], arrays['pml_y'] = self.pml_fields
+        state = {"step": int(self.step), "dt": self.dt, "shape": list(self.X.shape),
+                 "dtype": self.dtype.str, "bc": self.bc, "order": self.order,
+                 "linear": self.linear, "sources": self.sourcesKey()}
+
+        temp = "%s.%d.tmp"%(path, os.getpid())
+        with open(temp, 'wb') as file:
+            np.savez(file, state = np.array(json.dumps(state)), **arrays)
+        os.replace(temp, path)
+
+    def loadCheckpoint(self, path):
+        """
+        Loads a checkpoint saved by `saveCheckpoint`. `dt` and the mask composite are
+        restored, and the next simulation (`solvePoints`, `iterLevels` and the methods built
+        on them) resumes from the instant after the checkpoint, giving the same values as
+        the uninterrupted simulation. Only the instants after the checkpoint are recorded.
+        The tank must be built with the same grid and sources.
+
+        Raises:
+            Exception: "The checkpoint does not match the grid of the tank."
+            Exception: "The checkpoint does not match the sources of the tank."
+
+        Returns:
+            int: instant the simulation resumes from.
+        """
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+        state = json.loads(str(arrays.pop('state')))
+        if (tuple(state["shape"]) != self.X.shape or state["dtype"] != self.dtype.str or state["bc"] != self.bc
+                or state["order"] != self.order or state["linear"] != self.linear):
+            raise(Exception("The checkpoint does not match the grid of the tank."))
+        if state["sources"] != self.sourcesKey():
+            raise(Exception("The checkpoint does not match the sources of the tank."))
+
+        self.setdt(state["dt"])
+        self.mask = arrays['mask']
+        self.masked_deep = arrays['masked_deep']
+        state.update(arrays)
+        self.checkpoint_state = state
+        return state["step"]
+
+    def restoreLevels(self, n_instants, previous, current):
+        """
+        Writes on `previous` and `current` the levels of a loaded checkpoint, which is then
+        consumed, and sets the fields of the perfectly matched layer, zero without checkpoint.
+
+        Raises:
+            Exception: "The checkpoint is beyond the last instant."
+
+        Returns:
+            int: instant held by `current`, 0 without checkpoint.
+        """
+        state, self.checkpoint_state = self.checkpoint_state, None
+        if self.pml_fields is not None:
+            for field in self.pml_fields:
+                field.fill(0)
+        if state is None:
+            return 0
+        if state['step'] > n_instants - 1:
+            raise(Exception("The checkpoint is beyond the last instant."))
+        previous[:] = state['previous']
+        current[:] = state['current']
+        if self.pml_fields is not None:
+            self.pml_fields[0][:] = state['pml_x']
+            self.pml_fields[1][:] = state['pml_y']
+        self.step = state['step']
+        return self.step
+
+    def iterLevels(self, n_instants):
+        """
+        Generator that advances the simulation one instant at a time over `n_instants`.
+        The yielded array is the solver's own buffer, which is reused two instants later,
+        thus it must be copied if it is needed afterwards. The simulation stops
+        as soon as the consumer stops iterating. After `loadCheckpoint` the simulation
+        resumes from the checkpoint and the first yielded instant is its step.
+        Probes are recorded on every instant, the simulation stops early if one of
+        them asks to, such as a `SteadyStateMonitor`.
+
+        Raises:
+            Exception: "At least two instants are required."
+            Exception: "The checkpoint is beyond the last instant."
+
+        Yields:
+            int: instant index.
+            np.ndarray: 2d amplitude values at that instant.
+        """
+        if n_instants < 2:
+            raise(Exception("At least two instants are required."))
+
+        for probe in self.probes:
+            probe.start(self.firstInstant(), n_instants)
+        try:
+            for i, level in self.stepLevels(n_instants):
+                stop = [probe.sample(i, level) for probe in self.probes]
+                yield i, level
+                if any(stop):
+                    break
+        finally:
+            self.active = self.stepper = None
+            for probe in self.probes:
+                probe.stop()
+
+    def startActive(self, levels):
+        """
+        Sets `active` to the box of the source points and the non zero cells of `levels`
+        and of the auxiliary fields of the perfectly matched layer, None when
+        `active_region` is False or with local time stepping, whose levels are solved on
+        their own boxes. Cells out of the box are zero on every level.
+        """
+        self.active = None
+        if not self.active_region or self.stepper is not None:
+            return
+        nonzero = self.getSourcesPositions()
+        for level in list(levels) + list(self.pml_fields or []):
+            nonzero = nonzero | (level != 0)
+        rows, columns = np.flatnonzero(nonzero.any(axis = 1)), np.flatnonzero(nonzero.any(axis = 0))
+        if len(rows) == 0:
+            self.active = (0, 0, 0, 0)
+        else:
+            self.active = (rows[0], rows[-1] + 1, columns[0], columns[-1] + 1)
+
+    def growActive(self):
+        """
+        Grows `active` by the cells reached in one instant: half the stencil width, and
+        two cells on tanks with a perfectly matched layer, whose auxiliary fields add one
+        cell to the reach. Set to None once it covers the whole tank.
+        """
+        if self.active is None or self.active[0] >= self.active[1]:
+            return
+        reach = max(self.order//2, 2 if self.bc == 'pml' else 1)
+        n_rows, n_columns = self.X.shape
+        top, bottom, left, right = self.active
+        self.active = (max(top - reach, 0), min(bottom + reach, n_rows),
+                        max(left - reach, 0), min(right + reach, n_columns))
+        if self.active == (0, n_rows, 0, n_columns):
+            self.active = None
+
+    def stepLevels(self, n_instants):
+        """
+        Generator with the time levels of the simulation, see `iterLevels`.
+
+        Yields:
+            int: instant index.
+            np.ndarray: 2d amplitude values at that instant.
+        """
+        if self.n_processes > 1:
+            for i, level in DistributedSolver(self, self.n_processes).iterLevels(n_instants):
+                yield i, level
+            return
+
+        self.prepareStepping()
+        self.prepareSources()
+        self.stepper = LocalTimeStepper(self) if self.lts_levels > 1 else None
+        self.levels = [np.zeros_like(self.X, dtype = self.dtype) for i in range(3)]
+        previous, current, following = self.levels
+        first = self.restoreLevels(n_instants, previous, current)
+        self.startActive([previous, current])
+        if first == 0:
+            self.applySources(0, previous)
+            current[:] = previous
+            self.step = first = 1
+            yield 0, previous
+
+        for i in range(first, n_instants-1):
+            self.growActive()
+            self.solveInstant(previous, current, following)
+            if i == 1:
+                # the second instant starts as a copy of the first one
+                self.applySources(1, current)
+            self.applySources(i+1, following)
+            # levels are stored as they are resumed, from the instant i+1
+            self.levels = [current, following, previous]
+            self.step = i + 1
+            self.autoCheckpoint()
+            yield i, current
+
+            previous, current, following = current, following, previous
+
+        yield n_instants - 1, current
+
+    def iterFrames(self, n_instants, record = 1):
+        """
+        Generator version of `solvePoints`, frames are produced while the simulation
+        runs and only the instants selected by `record` are yielded (see `recordedInstants`).
+        Memory does not depend on `n_instants`, and the simulation is cancelled when
+        the consumer stops iterating.
+
+        Yields:
+            int: instant index.
+            np.ndarray: 2d array with the wave amplitude + deep.
+        """
+        for i, level in self.iterRecorded(n_instants, record):
+            yield i, level + self.masked_deep
+
+    def iterRecorded(self, n_instants, record = 1):
+        """
+        Generator over the amplitude of the instants selected by `record` (see
+        `recordingPolicy`). Fractional instants are linearly interpolated between the
+        two instants around them.
+
+        Yields:
+            float: instant index, int unless interpolated.
+            np.ndarray: 2d amplitude values at that instant.
+        """
+        if np.ndim(record) == 1:
+            instants = self.recordedInstants(n_instants, record)
+            if instants.dtype.kind == 'f':
+                for i, level in self.iterInterpolated(n_instants, instants):
+                    yield i, level
+                return
+
+        recorded = self.recordingPolicy(n_instants, record)
+        for i, level in self.iterLevels(n_instants):
+            if recorded(i):
+                yield i, level
+
+    def iterInterpolated(self, n_instants, instants):
+        """
+        Generator over the amplitude on the sorted fractional `instants`, linearly
+        interpolated between levels. Only the level before the next instant is kept.
+
+        Yields:
+            float: instant index.
+            np.ndarray: 2d amplitude values at that instant.
+        """
+        k = 0
+        last = np.zeros_like(self.X, dtype = self.dtype)
+        for i, level in self.iterLevels(n_instants):
+            while k < len(instants) and instants[k] <= i:
+                weight = instants[k] - (i - 1)
+                if weight >= 1:
+                    yield instants[k], level
+                else:
+                    yield instants[k], last + weight*(level - last)
+                k += 1
+            if k < len(instants) and instants[k] < i + 1:
+                last[:] = level
+
+    def solvePoints(self, n_instants, record = 1, storage = None, steady_tol = None):
+        """
+        Simulates `n_instants` of time. Only the three time levels required by the
+        finite differences scheme are kept in memory, `self.levels`, while frames are stored
+        following the `record` policy (see `recordedInstants`), thus memory does not grow
+        with `n_instants` unless every instant is recorded.
+
+        If `storage` is a path, frames are written to a memory mapped file on disk
+        (see `rippleTank.storage`) instead of memory, and both `amplitude` and
+        `complete_values` are `FrameStore` objects that read frames from disk when needed.
+
+        If `steady_tol` is given, the amplitude is compared cycle over cycle at the longest
+        period of the sources, and the simulation stops when the relative change falls below
+        `steady_tol` (see `SteadyStateMonitor`, kept on `steady_monitor`). Only the frames
+        up to that instant are stored, the last one is always stored when `record` is None.
+
+        Returns:
+            np.ndarray: 3d array, extra dimension represents time.
+        """
+        self.steady_monitor = None
+        if steady_tol is not None:
+            self.steady_monitor = SteadyStateMonitor(self, steady_tol)
+        try:
+            if storage is not None:
+                return self.solveToStorage(n_instants, record, storage)
+
+            self.recorded = self.recordedInstants(n_instants, record)
+            self.amplitude = np.zeros((len(self.recorded), self.n_cells_y, self.n_cells_x), dtype = self.dtype)
+
+            k = 0
+            for k, (i, level) in enumerate(self.iterRecorded(n_instants, record), 1):
+                self.amplitude[k - 1] = level
+            self.recorded, self.amplitude = self.recorded[:k], self.amplitude[:k]
+
+            converged = self.steadyInstant()
+            if record is None and converged is not None:
+                self.recorded = np.array([converged])
+                self.amplitude = self.steady_monitor.level[None].astype(self.dtype)
+        finally:
+            if self.steady_monitor is not None:
+                self.probes.remove(self.steady_monitor)
 
         self.complete_values = self.amplitude + self.masked_deep
         return self.complete_values
 
+    def steadyInstant(self):
+        """
+        Returns:
+            int: instant the last simulation reached the periodic steady state on,
+            None if it did not or `steady_tol` was not given.
+        """
+        if self.steady_monitor is None:
+            return None
+        if self.steady_monitor.instant is None:
+            warnings.warn("The periodic steady state was not reached, the relative change of the last cycle is %s."
+                            %(self.steady_monitor.values[-1] if len(self.steady_monitor.values) else None))
+        return self.steady_monitor.instant
+
+    def solveProbes(self, n_instants):
+        """
+        Simulates `n_instants` of time recording only the probes (see `rippleTank.probes`).
+        No frame is stored, thus memory grows with the probes and `n_instants` instead of
+        with the size of the tank.
+
+        Returns:
+            list: `values` of every probe.
+        """
+        for i, level in self.iterLevels(n_instants):
+            pass
+        return [probe.values for probe in self.probes]
+
+    def solveStatistics(self, n_instants, start = 0, stop = None):
+        """
+        Simulates `n_instants` of time accumulating only the maps of a `FieldStatistics`
+        over the instants from `start` to `stop`, such as the envelope and rms height
+        after the transient, with memory proportional to the size of the tank.
+
+        Returns:
+            FieldStatistics: accumulated maps.
+        """
+        statistics = FieldStatistics(self, start, stop)
+        try:
+            self.solveProbes(n_instants)
+        finally:
+            self.probes.remove(statistics)
+        return statistics
+
+    def solveSteadyState(self, freq = None):
+        """
+        Computes the time harmonic state reached when every source is a `sineSource`,
+        by a sparse solve instead of stepping (see `rippleTank.steady`). Sources of other
+        frequencies than `freq`, by default the one of the first source, are points
+        fixed to zero. Factorizations are kept, so later solves with the same masks and
+        frequency, for example moving the sources, are cheap.
+
+        Raises:
+            Exception: "The steady state requires linear=True."
+
+        Returns:
+            np.ndarray: 2d complex array, the amplitude at the instant i tends to
+            the imaginary part of `state*exp(2j*pi*freq*dt*i)`.
+        """
+        if not self.linear:
+            raise(Exception("The steady state requires linear=True."))
+        if freq is None:
+            freq = np.ravel(self.sources[0].freq)[0] if len(self.sources) else 1.0
+        if self.steady_solver is None:
+            self.steady_solver = SteadyStateSolver(self)
+        return self.steady_solver.solve(freq)
+
+    def solveToStorage(self, n_instants, record, path):
+        """
+        Simulates `n_instants` of time writing the frames selected by `record` on `path`.
+
+        Returns:
+            FrameStore: frames with amplitude + deep.
+        """
+        writer = FrameWriter(path, self)
+        try:
+            for i, level in self.iterRecorded(n_instants, record):
+                writer.append(i, level)
+            converged = self.steadyInstant()
+            if record is None and converged is not None:
+                writer.append(converged, self.steady_monitor.level)
+        finally:
+            self.complete_values = writer.close()
+
+        self.amplitude = self.complete_values.withDeep(False)
+        self.recorded = self.complete_values.instants
+        return self.complete_values
+
     def applyMask(self, frame):
         """
         Applies a numpy mask.
@@ -247,7 +932,7 @@ class RippleTank():
             self.mask = reduce(np.multiply, masks)
         else:
             self.mask = self.masks[0].mask
-        self.masked_deep = self.mask*self.deep
+        self.masked_deep = np.asarray(self.mask*self.deep, dtype = self.dtype)
 
     def animate(self, i, values, skip):
         """
@@ -261,10 +946,22 @@ class RippleTank():
         temp = self.applyMask(values[i])
         self.wave_show.set_array(temp)
 
-        t = i*self.dt
+        t = self.frameTime(i, values)
         self.time_label.set_text("%.3f s"%t)
         return self.wave_show, self.time_label,
 
+    def frameTime(self, i, values):
+        """
+        Time of the frame `i` of `values`, if `values` comes from the last simulation
+        the recorded instants are used.
+
+        Returns:
+            float: time in seconds.
+        """
+        if self.recorded is not None and len(self.recorded) == len(values):
+            return self.recorded[i]*self.dt
+        return i*self.dt
+
     def configPlot(self, figsize=(6, 4.5), xlabel = None, ylabel = None, cmap = jet,
                     vmin = None, vmax = None, cbar_label = None, origin='lower'):
         """
@@ -327,7 +1024,8 @@ class RippleTank():
     def verifyData(self, data):
         """
         Verifies if parameter data is different from None. If no simulation has between
-        run, simulates 100 instants of time.
+        run, simulates 100 instants of time. `data` can also be the path of a frames file
+        (see `rippleTank.storage`).
 
         Returns:
             np.ndarray: 3d array, extra dimension represent time.
@@ -337,6 +1035,8 @@ class RippleTank():
                 return self.solvePoints(100)
             else:
                 return self.complete_values
+        if isinstance(data, str):
+            return FrameStore(data)
         return data
 
     def captureFrame(self, data=None, fig = None, frame=-1):
@@ -357,7 +1057,7 @@ class RippleTank():
     def makeAnimation(self, data=None, fig = None, fps = None, duration = None):
         """
         Makes an animation of `data`, it only uses the required frames depending
-        on the duration and fps value.
+        on the duration and fps value. Data decimated by `simulateTime` is used frame by frame.
 
         Returns:
             matplotlib.animation.FuncAnimation: animation of the data.